@@ -14,8 +14,10 @@ Persistence API implementation for postgis.
 """
 
 import datetime
+import io
 import json
 import logging
+import struct
 import uuid  # noqa: F401
 from sqlalchemy import (
     cast,
@@ -29,7 +31,7 @@ from sqlalchemy import (
     column,
 )
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.sql.expression import Select
+from sqlalchemy.sql.expression import Select, table as table_clause
 from sqlalchemy.dialects.postgresql import INTERVAL
 from sqlalchemy.exc import IntegrityError
 
@@ -39,6 +41,7 @@ from typing import cast as type_cast
 from datacube.index.fields import OrExpression
 from datacube.model import Range
 from odc.geo import CRS, Geometry
+from datacube.utils import jsonify_document
 from datacube.utils.uris import split_uri
 from datacube.index.abstract import DSID
 from datacube.model.lineage import LineageRelation, LineageDirection
@@ -54,6 +57,27 @@ from ...utils.changes import Offset
 _LOG = logging.getLogger(__name__)
 
 
+_PRODUCT_BULK_COLUMNS = ("name", "metadata", "metadata_type_ref", "definition")
+
+
+# Framing for COPY ... WITH (FORMAT binary), as described in the "Binary Format" section of the COPY docs.
+_COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_BINARY_TRAILER = struct.pack(">h", -1)
+# Field count, then the length of the first (text) field.
+_COPY_PRODUCT_ROW = struct.Struct(">hi")
+_COPY_SMALLINT_FIELD = struct.Struct(">ih")
+_JSONB_BINARY_VERSION = b"\x01"
+
+
+def _jsonb_copy_field(doc) -> bytes:
+    """
+    Length-prefixed binary COPY field for a jsonb column.
+    """
+    # Matches the engine's json serialiser, which is bypassed when COPYing.
+    payload = _JSONB_BINARY_VERSION + json.dumps(jsonify_document(doc)).encode("utf-8")
+    return struct.pack(">i", len(payload)) + payload
+
+
 # Make a function because it's broken
 def _dataset_select_fields() -> tuple:
     return tuple(f.alchemy_expression for f in _dataset_fields())
@@ -430,6 +454,32 @@ class PostgisDbAPI:
         ).where(
             SpatialIndex.dataset_ref.in_(ids)
         )
+        return self._extent_from_query(query, crs)
+
+    def spatial_extent_by_product(self, product_id, crs):
+        """
+        Union of the extents of all active datasets of a product, computed in the database.
+        """
+        SpatialIndex = self._db.spatial_index(crs)  # noqa: N806
+        if SpatialIndex is None:
+            # Requested a CRS that has no spatial index, so use 4326 (which always has a spatial index)
+            # and reproject to requested CRS.
+            extent = self.spatial_extent_by_product(product_id, CRS("epsg:4326"))
+            return extent.to_crs(crs) if extent is not None else None
+        query = select(
+            func.ST_AsGeoJSON(func.ST_Union(SpatialIndex.extent))
+        ).select_from(
+            SpatialIndex
+        ).join(
+            Dataset, Dataset.id == SpatialIndex.dataset_ref
+        ).where(
+            Dataset.product_ref == product_id
+        ).where(
+            Dataset.archived.is_(None)
+        )
+        return self._extent_from_query(query, crs)
+
+    def _extent_from_query(self, query, crs):
         result = self._connection.execute(query)
         for r in result:
             extent_json = r[0]
@@ -535,6 +585,40 @@ class PostgisDbAPI:
         )
         return r.rowcount > 0
 
+    def delete_datasets_for_product(self, product_name, allow_delete_active=False):
+        """
+        Delete the datasets of a product (and their index entries) in bulk.
+
+        :param product_name: name of the product whose datasets are deleted
+        :param allow_delete_active: whether active (unarchived) datasets are deleted too
+        :return: tuple of (number of datasets deleted, number of datasets remaining for the product)
+        """
+        product_ref = select(Product.id).where(Product.name == product_name).scalar_subquery()
+        condition = Dataset.product_ref == product_ref
+        if not allow_delete_active:
+            condition = and_(condition, Dataset.archived.isnot(None))
+        dataset_ids = select(Dataset.id).where(condition)
+        for table in search_field_indexes.values():
+            self._connection.execute(
+                delete(table).where(table.dataset_ref.in_(dataset_ids))
+            )
+        for crs in self._db.spatially_indexed_crses():
+            SpatialIndex = self._db.spatial_index(crs)  # noqa: N806
+            self._connection.execute(
+                delete(
+                    SpatialIndex
+                ).where(
+                    SpatialIndex.dataset_ref.in_(dataset_ids)
+                )
+            )
+        deleted = self._connection.execute(
+            delete(Dataset).where(condition)
+        ).rowcount
+        remaining = self._connection.execute(
+            select(func.count()).select_from(Dataset).where(Dataset.product_ref == product_ref)
+        ).scalar()
+        return deleted, remaining
+
     def get_dataset(self, dataset_id):
         return self._connection.execute(
             select(*_dataset_select_fields()).where(Dataset.id == dataset_id)
@@ -1077,23 +1161,83 @@ class PostgisDbAPI:
                        metadata,
                        metadata_type_id,
                        definition):
+        """
+        Insert a product.
 
+        :return: the inserted product row (as returned by get_product)
+        """
         res = self._connection.execute(
-            insert(Product).values(
+            insert(Product).returning(*Product.__table__.columns).values(
                 name=name,
                 metadata=metadata,
                 metadata_type_ref=metadata_type_id,
                 definition=definition
             )
         )
+        return res.first()
 
-        type_id = res.inserted_primary_key[0]
+    def insert_product_bulk(self, values):
+        """
+        Insert a batch of products, skipping any whose name is already indexed.
 
-        return type_id
+        Rows are streamed into a temporary staging table with a binary COPY, then moved into
+        the product table with a single INSERT ... SELECT.  Must be called in a transaction,
+        which drops the staging table when it ends.
 
-    def insert_product_bulk(self, values):
-        requested = len(values)
-        res = self._connection.execute(insert(Product), values)
+        :param values: iterable of (name, metadata, metadata_type_ref, definition) tuples
+        :return: tuple of (added, skipped)
+        """
+        # Documents shared between rows are only encoded once.  Each entry keeps a reference
+        # to its document so the id() key can't be recycled while the batch is being written.
+        encoded: dict[int, tuple[Any, bytes]] = {}
+
+        def _encode(doc) -> bytes:
+            hit = encoded.get(id(doc))
+            if hit is None:
+                hit = encoded[id(doc)] = (doc, _jsonb_copy_field(doc))
+            return hit[1]
+
+        buf = io.BytesIO()
+        buf.write(_COPY_BINARY_HEADER)
+        requested = 0
+        for name, metadata, metadata_type_ref, definition in values:
+            name_bytes = name.encode("utf-8")
+            buf.write(_COPY_PRODUCT_ROW.pack(4, len(name_bytes)))
+            buf.write(name_bytes)
+            buf.write(_encode(metadata))
+            buf.write(_COPY_SMALLINT_FIELD.pack(2, metadata_type_ref))
+            buf.write(_encode(definition))
+            requested += 1
+        if not requested:
+            return 0, 0
+        buf.write(_COPY_BINARY_TRAILER)
+        buf.seek(0)
+
+        if self._sqla_txn is None:
+            raise RuntimeError('Must bulk insert products in transaction')
+        self._connection.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS product_stage "
+            "(name text, metadata jsonb, metadata_type_ref smallint, definition jsonb) "
+            "ON COMMIT DROP"
+        ))
+        # Clear out any earlier batch staged in the same transaction.
+        self._connection.execute(text("TRUNCATE product_stage"))
+        cursor = self._connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY product_stage (name, metadata, metadata_type_ref, definition) "
+                "FROM STDIN WITH (FORMAT binary)",
+                buf
+            )
+        finally:
+            cursor.close()
+        stage = table_clause("product_stage", *(column(c) for c in _PRODUCT_BULK_COLUMNS))
+        res = self._connection.execute(
+            insert(Product).from_select(
+                _PRODUCT_BULK_COLUMNS,
+                select(*stage.c)
+            ).on_conflict_do_nothing(index_elements=["name"])
+        )
         return res.rowcount, requested - res.rowcount
 
     def update_product(self,
@@ -1102,8 +1246,13 @@ class PostgisDbAPI:
                        metadata_type_id,
                        definition,
                        update_metadata_type=False):
+        """
+        Update a product.
+
+        :return: the updated product row (as returned by get_product)
+        """
         res = self._connection.execute(
-            update(Product).returning(Product.id).where(
+            update(Product).returning(*Product.__table__.columns).where(
                 Product.name == name
             ).values(
                 metadata=metadata,
@@ -1111,7 +1260,8 @@ class PostgisDbAPI:
                 definition=definition
             )
         )
-        prod_id = res.first()[0]
+        row = res.first()
+        prod_id = row.id
 
         if update_metadata_type:
             if not self._connection.in_transaction():
@@ -1125,7 +1275,7 @@ class PostgisDbAPI:
                 )
             )
 
-        return prod_id
+        return row
 
     def delete_product(self, name):
         res = self._connection.execute(
@@ -1177,10 +1327,22 @@ class PostgisDbAPI:
             select(Product).order_by(Product.name.asc())
         ).fetchall()
 
-    def get_all_product_docs(self):
-        return self._connection.execute(
-            select(Product.definition)
-        )
+    def get_all_product_docs(self, batch_size: int = 0):
+        """
+        Return all product definition documents.
+
+        :param batch_size: Number of streamed rows to fetch from database at once.
+                           Defaults to zero, which means no streaming.
+                           Note streaming is only supported inside a transaction.
+        """
+        if batch_size > 0 and not self.in_transaction:
+            raise ValueError("Postgresql bulk reads must occur within a transaction.")
+        query = select(Product.definition)
+        if batch_size > 0:
+            conn = self._connection.execution_options(stream_results=True, yield_per=batch_size)
+        else:
+            conn = self._connection
+        return conn.execute(query)
 
     def _get_products_for_metadata_type(self, id_):
         return self._connection.execute(
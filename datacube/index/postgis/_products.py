@@ -4,9 +4,14 @@
 # SPDX-License-Identifier: Apache-2.0
 import datetime
 import logging
+import math
+import os
+import numpy
 
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
 from time import monotonic
-from cachetools.func import lru_cache
 
 from odc.geo.geom import CRS, Geometry
 from datacube.index import fields
@@ -17,16 +22,96 @@ from datacube.model import Product, MetadataType
 from datacube.utils import jsonify_document, changes, _readable_offset
 from datacube.utils.changes import check_doc_unchanged, get_doc_changes
 
-from typing import Iterable, Sequence, cast
+from typing import Any, Iterable, Sequence, cast
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 _LOG = logging.getLogger(__name__)
 
+# Large product batches are split across up to this many connections when bulk adding.
+_MAX_BATCH_WORKERS = min(os.cpu_count() or 1, 8)
+_MIN_BATCH_ROWS_PER_WORKER = 100
+
+
+def _orjson_default(v):
+    if isinstance(v, numpy.dtype):
+        return v.name
+    if isinstance(v, (Decimal, CRS)):
+        return str(v)
+    raise TypeError
+
+
+def _has_non_finite(doc) -> bool:
+    """
+    Whether a document contains any NaN or infinite float values.
+    """
+    stack = [doc]
+    while stack:
+        v = stack.pop()
+        if isinstance(v, dict):
+            stack.extend(v.values())
+        elif isinstance(v, (list, tuple)):
+            stack.extend(v)
+        elif isinstance(v, float) and not math.isfinite(v):
+            return True
+    return False
+
+
+def _jsonify_definition(doc):
+    """
+    Equivalent to jsonify_document() for comparing product definitions, using orjson when available.
+    """
+    # orjson writes NaN/Infinity as null, jsonify_document spells them out.
+    if orjson is None or _has_non_finite(doc):
+        return jsonify_document(doc)
+    try:
+        # Without OPT_NON_STR_KEYS orjson rejects non-str keys, which jsonify_document passes through str().
+        encoded = orjson.dumps(doc, default=_orjson_default)
+    except TypeError:
+        return jsonify_document(doc)
+    return orjson.loads(encoded)
+
+
+def _versioned_lru_cache(fetch, versions):
+    """
+    Memoize a single-argument lookup, keyed on the argument and its current entry in versions.
+
+    Bumping the version of a key makes later calls miss the cache for that key only.
+    The returned function still provides cache_clear() to drop everything.
+    """
+    cached = lru_cache()(lambda key, version: fetch(key))
+
+    def lookup(key):
+        return cached(key, versions.get(key, 0))
+
+    lookup.cache_clear = cached.cache_clear  # type: ignore[attr-defined]
+    return lookup
+
 
 class ProductResource(AbstractProductResource, IndexResourceAddIn):
     """
     Postgis driver product resource implementation
     """
 
+    _UPDATES_ALLOWED = {
+        ('description',): changes.allow_any,
+        ('license',): changes.allow_any,
+        ('metadata_type',): changes.allow_any,
+
+        # You can safely make the match rules looser but not tighter.
+        # Tightening them could exclude datasets already matched to the product.
+        # (which would make search results wrong)
+        ('metadata',): changes.allow_truncation,
+
+        # Some old storage fields should not be in the product definition any more: allow removal.
+        ('storage', 'chunking'): changes.allow_removal,
+        ('storage', 'driver'): changes.allow_removal,
+        ('storage', 'dimension_order'): changes.allow_removal,
+    }
+
     def __init__(self, db, index):
         """
         :type db: datacube.drivers.postgis._connections.PostgresDb
@@ -34,8 +119,12 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
         """
         super().__init__(index)
         self._db = db
-        self.get_unsafe = lru_cache()(self.get_unsafe)
-        self.get_by_name_unsafe = lru_cache()(self.get_by_name_unsafe)
+        # Bumped per product id and name when a product changes, so only its cache entries go stale.
+        self._versions: dict[int | str, int] = {}
+        self.get_unsafe = _versioned_lru_cache(self.get_unsafe, self._versions)
+        self.get_by_name_unsafe = _versioned_lru_cache(self.get_by_name_unsafe, self._versions)
+        # (time fetched, products) for get_all(), dropped whenever this resource writes a product.
+        self._all_products: tuple[float, tuple[Product, ...]] | None = None
 
     def __getstate__(self):
         """
@@ -68,7 +157,7 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
             _LOG.warning(f"Product {product.name} is already in the database, checking for differences")
             check_doc_unchanged(
                 existing.definition,
-                jsonify_document(product.definition),
+                _jsonify_definition(product.definition),
                 'Metadata Type {}'.format(product.name)
             )
         else:
@@ -78,31 +167,60 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
                 metadata_type = self._index.metadata_types.add(product.metadata_type,
                                                                allow_table_lock=allow_table_lock)
             with self._db_connection() as connection:
-                connection.insert_product(
+                row = connection.insert_product(
                     name=product.name,
                     metadata=product.metadata_doc,
                     metadata_type_id=metadata_type.id,
                     definition=product.definition,
                 )
-        return self.get_by_name(product.name)
+            self._all_products = None
+            return self._make(row)
+        return existing
+
+    def bulk_add(self,
+                 product_docs: Iterable[JsonDict],
+                 metadata_types: dict[str, MetadataType] | None = None,
+                 batch_size: int = 1000) -> BatchStatus:
+        # The check against existing products must see those added or changed by other processes.
+        self._all_products = None
+        return super().bulk_add(product_docs, metadata_types=metadata_types, batch_size=batch_size)
 
     def _add_batch(self, batch_products: Iterable[Product]) -> BatchStatus:
-        # Would be nice to keep this level of internals hidden from this layer,
-        # but most efficient to do it before grabbing a connection and keep the implementation
-        # as close to SQLAlchemy as possible.
         b_started = monotonic()
-        values = [
-            {
-                "name": p.name,
-                "metadata": p.metadata_doc,
-                "metadata_type_ref": p.metadata_type.id,
-                "definition": p.definition
-            }
-            for p in batch_products
-        ]
-        with self._db_connection() as connection:
-            added, skipped = connection.insert_product_bulk(values)
+        products = list(batch_products)
+        n_workers = min(_MAX_BATCH_WORKERS, len(products) // _MIN_BATCH_ROWS_PER_WORKER)
+        if n_workers <= 1 or self._index.thread_transaction() is not None:
+            # Worker threads can't share this thread's transaction, so stay on one connection.
+            added, skipped = self._insert_product_rows(products)
+            self._all_products = None
             return BatchStatus(added, skipped, monotonic() - b_started)
+        chunk_size = -(-len(products) // n_workers)
+        chunks = [products[i:i + chunk_size] for i in range(0, len(products), chunk_size)]
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(self._insert_product_rows, chunk) for chunk in chunks]
+        # Every chunk has finished, each committed or rolled back in its own transaction.
+        self._all_products = None
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            _LOG.error(
+                "%d of %d product chunks failed; %d products in the other chunks were committed",
+                len(errors), len(chunks),
+                sum(len(chunk) for chunk, f in zip(chunks, futures) if f.exception() is None),
+            )
+            raise errors[0]
+        results = [f.result() for f in futures]
+        return BatchStatus(sum(r[0] for r in results), sum(r[1] for r in results), monotonic() - b_started)
+
+    def _insert_product_rows(self, products: Iterable[Product]) -> tuple[int, int]:
+        # Would be nice to keep this level of internals hidden from this layer,
+        # but rows are generated lazily and streamed straight into the bulk insert.
+        # Each call checks out its own pooled connection when run from a worker thread.
+        rows = (
+            (p.name, p.metadata_doc, p.metadata_type.id, p.definition)
+            for p in products
+        )
+        with self._db_connection(transaction=True) as connection:
+            return connection.insert_product_bulk(rows)
 
     def can_update(self, product, allow_unsafe_updates=False):
         """
@@ -115,30 +233,29 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
         :param bool allow_unsafe_updates: Allow unsafe changes. Use with caution.
         :rtype: bool,list[change],list[change]
         """
-        Product.validate(product.definition)
+        _, can_update, good_changes, bad_changes = self._check_update(product, allow_unsafe_updates)
+        return can_update, good_changes, bad_changes
+
+    def _check_update(self, product, allow_unsafe_updates=False, validate=True):
+        """
+        As for can_update, but also return the currently indexed product.
+
+        :param bool validate: Validate the product definition (skip if it has just been validated)
+        :rtype: Product,bool,list[change],list[change]
+        """
+        if validate:
+            Product.validate(product.definition)
 
         existing = self.get_by_name(product.name)
         if not existing:
             raise ValueError('Unknown product %s, cannot update – did you intend to add it?' % product.name)
 
-        updates_allowed = {
-            ('description',): changes.allow_any,
-            ('license',): changes.allow_any,
-            ('metadata_type',): changes.allow_any,
-
-            # You can safely make the match rules looser but not tighter.
-            # Tightening them could exclude datasets already matched to the product.
-            # (which would make search results wrong)
-            ('metadata',): changes.allow_truncation,
-
-            # Some old storage fields should not be in the product definition any more: allow removal.
-            ('storage', 'chunking'): changes.allow_removal,
-            ('storage', 'driver'): changes.allow_removal,
-            ('storage', 'dimension_order'): changes.allow_removal,
-        }
-
-        doc_changes = get_doc_changes(existing.definition, jsonify_document(product.definition))
-        good_changes, bad_changes = changes.classify_changes(doc_changes, updates_allowed)
+        if existing.definition == product.definition:
+            # Re-applying an unchanged definition is the common case: no need to normalise and diff it.
+            doc_changes = []
+        else:
+            doc_changes = get_doc_changes(existing.definition, _jsonify_definition(product.definition))
+        good_changes, bad_changes = changes.classify_changes(doc_changes, self._UPDATES_ALLOWED)
 
         for offset, old_val, new_val in good_changes:
             _LOG.info("Safe change in %s from %r to %r", _readable_offset(offset), old_val, new_val)
@@ -146,7 +263,7 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
         for offset, old_val, new_val in bad_changes:
             _LOG.warning("Unsafe change in %s from %r to %r", _readable_offset(offset), old_val, new_val)
 
-        return allow_unsafe_updates or not bad_changes, good_changes, bad_changes
+        return existing, allow_unsafe_updates or not bad_changes, good_changes, bad_changes
 
     def update(self, product: Product, allow_unsafe_updates=False, allow_table_lock=False):
         """
@@ -164,12 +281,15 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
             If false, creation will be slower and cannot be done in a transaction.
         :rtype: Product
         """
+        return self._update(product, allow_unsafe_updates=allow_unsafe_updates, allow_table_lock=allow_table_lock)
 
-        can_update, safe_changes, unsafe_changes = self.can_update(product, allow_unsafe_updates)
+    def _update(self, product: Product, allow_unsafe_updates=False, allow_table_lock=False, validate=True):
+        existing, can_update, safe_changes, unsafe_changes = self._check_update(product, allow_unsafe_updates,
+                                                                                validate=validate)
 
         if not safe_changes and not unsafe_changes:
             _LOG.warning("No changes detected for product %s", product.name)
-            return self.get_by_name(product.name)
+            return existing
 
         if not can_update:
             raise ValueError(f"Unsafe changes in {product.name}: " + (
@@ -181,7 +301,6 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
 
         _LOG.info("Updating product %s", product.name)
 
-        existing = cast(Product, self.get_by_name(product.name))
         changing_metadata_type = product.metadata_type.name != existing.metadata_type.name
         if changing_metadata_type:
             raise ValueError("Unsafe change: cannot (currently) switch metadata types for a product")
@@ -203,7 +322,7 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
         # TODO: should we add metadata type here?
         assert metadata_type, "TODO: should we add metadata type here?"
         with self._db_connection() as conn:
-            conn.update_product(
+            row = conn.update_product(
                 name=product.name,
                 metadata=product.metadata_doc,
                 metadata_type_id=metadata_type.id,
@@ -211,9 +330,9 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
                 update_metadata_type=changing_metadata_type
             )
 
-        self.get_by_name_unsafe.cache_clear()  # type: ignore[attr-defined]
-        self.get_unsafe.cache_clear()          # type: ignore[attr-defined]
-        return self.get_by_name(product.name)
+        self._bump_versions(row.id, product.name)
+        self._all_products = None
+        return self._make(row)
 
     def update_document(self, definition, allow_unsafe_updates=False, allow_table_lock=False):
         """
@@ -228,11 +347,13 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
             If false, creation will be slower and cannot be done in a transaction.
         :rtype: Product
         """
+        # from_doc has already validated the definition.
         type_ = self.from_doc(definition)
-        return self.update(
+        return self._update(
             type_,
             allow_unsafe_updates=allow_unsafe_updates,
             allow_table_lock=allow_table_lock,
+            validate=False,
         )
 
     def delete(self, products: Iterable[Product], allow_delete_active: bool = False) -> Sequence[Product]:
@@ -247,21 +368,24 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
         deleted = []
         for product in products:
             with self._db_connection(transaction=True) as conn:
-                # First find and delete all related datasets
-                product_datasets = self._index.datasets.search_returning(('id',),
-                                                                         archived=None, product=product.name)
-                product_datasets = [ds.id for ds in product_datasets]  # type: ignore[attr-defined]
-                purged = self._index.datasets.purge(product_datasets, allow_delete_active)
+                # First delete all related datasets
+                _, remaining = conn.delete_datasets_for_product(product.name, allow_delete_active)
                 # if not all product datasets are purged, it must be because
                 # we're not allowing active datasets to be purged
-                if len(purged) != len(product_datasets):
+                if remaining:
                     _LOG.warning(f"Product {product.name} cannot be deleted because it has active datasets.")
                     continue
                 # Now we can safely delete the Product
-                conn.delete_product(product.name)
+                product_id = conn.delete_product(product.name)
+                self._bump_versions(product_id, product.name)
                 deleted.append(product)
+        self._all_products = None
         return deleted
 
+    def _bump_versions(self, *keys: int | str) -> None:
+        for key in keys:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
     # This is memoized in the constructor
     # pylint: disable=method-hidden
     def get_unsafe(self, id_):  # type: ignore
@@ -296,32 +420,41 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
             else:
                 return [v]
 
+        query = dict(query)
+        # If they specified specific product/metadata-types, we can quickly skip non-matches.
+        product_names = set(_listify(query.pop('product'))) if 'product' in query else None
+        metadata_type_names = set(_listify(query.pop('metadata_type'))) if 'metadata_type' in query else None
+        # Geometry field is handled elsewhere by index drivers that support spatial indexes.
+        matchable = [(key, value) for key, value in query.items() if key != "geopolygon"]
+        # Expressions only depend on the field and value, so build each one once per call.
+        # (Entries hold a reference to their field, so the id() in the key stays unique.)
+        expressions: dict[tuple[str, int], tuple[Any, Any]] = {}
+
         for type_ in self.get_all():
-            remaining_matchable = query.copy()
-            # If they specified specific product/metadata-types, we can quickly skip non-matches.
-            if type_.name not in _listify(remaining_matchable.pop('product', type_.name)):
+            if product_names is not None and type_.name not in product_names:
                 continue
-            if type_.metadata_type.name not in _listify(remaining_matchable.pop('metadata_type',
-                                                                                type_.metadata_type.name)):
+            if metadata_type_names is not None and type_.metadata_type.name not in metadata_type_names:
                 continue
 
+            remaining_matchable = query.copy()
             # Check that all the keys they specified match this product.
-            for key, value in list(remaining_matchable.items()):
-                if key == "geopolygon":
-                    # Geometry field is handled elsewhere by index drivers that support spatial indexes.
-                    continue
-                field = type_.metadata_type.dataset_fields.get(key)
-                if not field:
+            for key, value in matchable:
+                field_entry = type_.metadata_type.dataset_fields_index.get(key)
+                if not field_entry:
                     # This type doesn't have that field, so it cannot match.
                     break
-                if not field.can_extract:
+                field, extract = field_entry
+                if extract is None:
                     # non-document/native field
                     continue
-                if field.extract(type_.metadata_doc) is None:
+                if extract(type_.metadata_doc) is None:
                     # It has this field but it's not defined in the type doc, so it's unmatchable.
                     continue
 
-                expr = fields.as_expression(field, value)
+                cached = expressions.get((key, id(field)))
+                if cached is None:
+                    cached = expressions[(key, id(field))] = (field, fields.as_expression(field, value))
+                expr = cached[1]
                 if expr.evaluate(type_.metadata_doc):
                     remaining_matchable.pop(key)
                 else:
@@ -347,22 +480,48 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
     def get_all(self) -> Iterable[Product]:
         """
         Retrieve all Products
+
+        Outside a transaction, results are cached for up to the environment's ``product_cache_ttl``
+        seconds, and refreshed as soon as products are written through this resource.
         """
+        ttl = self._index.environment.product_cache_ttl
+        # Products written in a transaction must not be cached, in case it is rolled back.
+        use_cache = ttl > 0 and self._index.thread_transaction() is None
+        cached = self._all_products
+        if use_cache and cached is not None and monotonic() - cached[0] < ttl:
+            return iter(cached[1])
+        fetched = monotonic()
         with self._db_connection() as connection:
-            return self._make_many(connection.get_all_products())
+            products = tuple(self._make_many(connection.get_all_products()))
+        if use_cache:
+            self._all_products = (fetched, products)
+        return iter(products)
 
-    def get_all_docs(self) -> Iterable[JsonDict]:
-        with self._db_connection() as connection:
-            for row in connection.get_all_product_docs():
+    def get_all_docs(self, batch_size: int = 1000) -> Iterable[JsonDict]:
+        """
+        Retrieve all Product definition documents, streamed from the database in batches.
+
+        :param batch_size: Number of documents to fetch from the database at once.
+        """
+        with self._db_connection(transaction=True) as connection:
+            for row in connection.get_all_product_docs(batch_size=batch_size):
                 yield row[0]
 
     def _make_many(self, query_rows):
-        return (self._make(c) for c in query_rows)
+        query_rows = list(query_rows)
+        # Resolve each distinct metadata type once, rather than once per product.
+        metadata_types = {
+            ref: self._index.metadata_types.get(ref)
+            for ref in {row.metadata_type_ref for row in query_rows}
+        }
+        return (self._make(row, metadata_types[row.metadata_type_ref]) for row in query_rows)
 
-    def _make(self, query_row) -> Product:
+    def _make(self, query_row, metadata_type: MetadataType | None = None) -> Product:
+        if metadata_type is None:
+            metadata_type = self._index.metadata_types.get(query_row.metadata_type_ref)
         return Product(
             definition=query_row.definition,
-            metadata_type=cast(MetadataType, self._index.metadata_types.get(query_row.metadata_type_ref)),
+            metadata_type=cast(MetadataType, metadata_type),
             id_=query_row.id,
         )
 
@@ -382,9 +541,10 @@ class ProductResource(AbstractProductResource, IndexResourceAddIn):
     def spatial_extent(self, product: str | Product, crs: CRS = CRS("EPSG:4326")) -> Geometry | None:
         if isinstance(product, str):
             product = self._index.products.get_by_name_unsafe(product)
-        ids = [ds.id for ds in self._index.datasets.search(product=product.name)]
+        assert isinstance(product, Product)
+        assert product.id is not None
         with self._db_connection() as connection:
-            return connection.spatial_extent(ids, crs)
+            return connection.spatial_extent_by_product(product.id, crs)
 
     def most_recent_change(self, product: str | Product) -> datetime.datetime | None:
         if isinstance(product, str):
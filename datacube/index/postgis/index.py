@@ -9,7 +9,7 @@ from typing import Iterable, Iterator, Sequence, Type
 
 from deprecat import deprecat
 from datacube.cfg.api import ODCEnvironment, ODCOptionHandler
-from datacube.cfg.opt import config_options_for_psql_driver
+from datacube.cfg.opt import IntOptionHandler, config_options_for_psql_driver
 from datacube.drivers.postgis import PostGisDb, PostgisDbAPI
 from datacube.index.postgis._transaction import PostgisTransaction
 from datacube.index.postgis._datasets import DatasetResource
@@ -29,6 +29,7 @@ _LOG = logging.getLogger(__name__)
 
 
 _DEFAULT_METADATA_TYPES_PATH = Path(__file__).parent.joinpath('default-metadata-types.yaml')
+_DEFAULT_PRODUCT_CACHE_TTL = 0
 
 
 class Index(AbstractIndex):
@@ -243,7 +244,10 @@ class PostgisIndexDriver(AbstractIndexDriver):
 
     @staticmethod
     def get_config_option_handlers(env: ODCEnvironment) -> Iterable[ODCOptionHandler]:
-        return config_options_for_psql_driver(env)
+        return [
+            *config_options_for_psql_driver(env),
+            IntOptionHandler("product_cache_ttl", env, default=_DEFAULT_PRODUCT_CACHE_TTL, minval=0),
+        ]
 
 
 def index_driver_init():
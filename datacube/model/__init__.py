@@ -14,7 +14,7 @@ from pathlib import Path
 from uuid import UUID
 
 from affine import Affine
-from typing import Optional, List, Mapping, Any, Dict, Tuple, Iterator, Iterable, Union, Sequence
+from typing import Optional, List, Mapping, Any, Callable, Dict, Tuple, Iterator, Iterable, Union, Sequence
 
 from urllib.parse import urlparse
 from datacube.utils import without_lineage_sources, parse_time, cached_property, uri_to_local_path, \
@@ -554,6 +554,16 @@ class MetadataType:
     def description(self) -> str:
         return self.definition.get('description', None)
 
+    @cached_property
+    def dataset_fields_index(self) -> Mapping[str, Tuple[Field, Optional[Callable[[Any], Any]]]]:
+        """
+        Dataset fields by name, paired with their extract method (None for fields that can't be extracted)
+        """
+        return {
+            name: (field, field.extract if field.can_extract else None)
+            for name, field in self.dataset_fields.items()
+        }
+
     def dataset_reader(self, dataset_doc: Mapping[str, Field]) -> DocReader:
         return DocReader(self.definition['dataset'], self.dataset_fields, dataset_doc)
 
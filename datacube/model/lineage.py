@@ -2,8 +2,11 @@
 #
 # Copyright (c) 2015-2025 ODC Contributors
 # SPDX-License-Identifier: Apache-2.0
+from collections import deque
 from dataclasses import dataclass
 from enum import Enum
+from itertools import chain
+import sys
 from uuid import UUID
 from typing import Mapping, Optional, Sequence, Tuple, Iterable, Any, cast
 
@@ -18,11 +21,8 @@ class LineageDirection(Enum):
     SOURCES = 1
     DERIVED = 2
 
-    def opposite(self):
-        if self == self.SOURCES:
-            return self.DERIVED
-        else:
-            return self.SOURCES
+    def opposite(self) -> "LineageDirection":
+        return _OPPOSITE_DIRECTIONS[self]
 
     @property
     def label(self):
@@ -32,10 +32,16 @@ class LineageDirection(Enum):
             return "derivations"
 
 
+_OPPOSITE_DIRECTIONS = {
+    LineageDirection.SOURCES: LineageDirection.DERIVED,
+    LineageDirection.DERIVED: LineageDirection.SOURCES,
+}
+
+
 SerialisedTree = dict[str, str | dict[str, list["SerialisedTree"]]]
 
 
-@dataclass
+@dataclass(slots=True)
 class LineageTree:
     """
     A node in a Dataset Lineage tree.
@@ -208,16 +214,30 @@ class LineageTree:
         )
 
     def child_datasets(self) -> set[UUID]:
+        """
+        The ids of all datasets below this node in the tree.
+
+        Raises InconsistentLineageException if any dataset appears below itself.
+        """
         child_dsids: set[UUID] = set()
         if self.children is None:
             return child_dsids
-        for classifier, children in self.children.items():
-            for child in children:
-                subchildren = child.child_datasets()
-                subchildren.add(child.dataset_id)
-                if self.dataset_id in subchildren:
-                    raise InconsistentLineageException("LineageTrees must be acyclic")
-                child_dsids.update(subchildren)
+        # Iterative depth-first traversal, tracking the dataset ids on the current path for cycle detection.
+        on_path = {self.dataset_id}
+        stack = [(self, chain.from_iterable(self.children.values()))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                on_path.discard(node.dataset_id)
+                continue
+            if child.dataset_id in on_path:
+                raise InconsistentLineageException("LineageTrees must be acyclic")
+            child_dsids.add(child.dataset_id)
+            if child.children:
+                on_path.add(child.dataset_id)
+                stack.append((child, chain.from_iterable(child.children.values())))
         return child_dsids
 
 
@@ -227,7 +247,7 @@ class InconsistentLineageException(Exception):
     """
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class LineageIDPair:
     """
     LineagePair
@@ -239,7 +259,7 @@ class LineageIDPair:
     source_id: UUID
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class LineageRelation:
     """
     LineageRelation
@@ -250,6 +270,10 @@ class LineageRelation:
     source_id: UUID
     derived_id: UUID
 
+    def __post_init__(self):
+        # Classifiers come from a small vocabulary - share one string object per classifier.
+        object.__setattr__(self, "classifier", sys.intern(self.classifier))
+
     def ids(self):
         return LineageIDPair(derived_id=self.derived_id, source_id=self.source_id)
 
@@ -291,14 +315,18 @@ class LineageRelations:
         # Tuple[UUID, UUID]'s are always (derived, source)
         # Mapping  (derived, source): classifier - Allow search by source, derived pair.
         self._relations_idx: dict[LineageIDPair, str] = {}
-        # Sequence of the distinct LineageRelation objects this object represents.
-        self.relations: list[LineageRelation] = []
         # Mapping source to mapping derived to classifier.  Allow search by source
         self.by_source: dict[UUID, dict[UUID, str]] = {}
         # Mapping source to mapping derived to classifier.  Allow search by derived
         self.by_derived: dict[UUID, dict[UUID, str]] = {}
         # Dataset ids known to this object
         self.dataset_ids: set[UUID] = set()
+        # Pseudo-topological order of dataset ids (sources before derived) for incremental cycle detection.
+        # New sources are numbered down from zero and new derived datasets up from zero, so that merging
+        # a tree in either direction never requires reordering.
+        self._order: dict[UUID, int] = {}
+        self._min_order = 0
+        self._max_order = 0
 
         # Merge initial arguments
         if clone is not None:
@@ -312,6 +340,18 @@ class LineageRelations:
             for id_, home in homes.items():
                 self.merge_new_home(id_, home)
 
+    @property
+    def relations(self) -> list[LineageRelation]:
+        """
+        The distinct LineageRelation objects this collection represents.
+
+        Built on demand from the relations index.
+        """
+        return [
+            LineageRelation(classifier=classifier, derived_id=ids.derived_id, source_id=ids.source_id)
+            for ids, classifier in self._relations_idx.items()
+        ]
+
     def merge_new_home(self, id_: UUID, home: str) -> None:
         """
         Merge a new home relation
@@ -331,6 +371,9 @@ class LineageRelations:
         """
         Internal convenience wrapper to merge_new_lineage_relation
         """
+        if self._relations_idx.get(ids) == classifier:
+            # Already known - skip building a LineageRelation
+            return
         self.merge_new_lineage_relation(
             LineageRelation(
                 classifier=classifier,
@@ -345,28 +388,116 @@ class LineageRelations:
         this relation would result in a cyclic relation.
         """
         ids = rel.ids()
-        if ids in self._relations_idx:
-            if self._relations_idx[ids] != rel.classifier:
+        current = self._relations_idx.get(ids)
+        if current is not None:
+            if current != rel.classifier:
                 raise InconsistentLineageException(
                     f"Dataset {ids.derived_id} is derived from {ids.source_id} with inconsistent classifiers."
                 )
-        else:
-            self._relations_idx[ids] = rel.classifier
-            self.relations.append(rel)
-            if rel.source_id not in self.by_source:
-                self.by_source[rel.source_id] = {}
-            if rel.derived_id not in self.by_derived:
-                self.by_derived[rel.derived_id] = {}
-            self.by_source[rel.source_id][rel.derived_id] = rel.classifier
-            self.by_derived[rel.derived_id][rel.source_id] = rel.classifier
-            # Check for cyclic dependencies:
-            new_ids = set([ids.derived_id, ids.source_id])
-            if new_ids & self.dataset_ids:
-                # We already know about these ids so need to confirm we are still acyclic
-                # Extract sourcewards from derived and vice versa for full tree coverage
-                self.extract_tree(rel.derived_id, direction=LineageDirection.SOURCES)
-                self.extract_tree(rel.source_id, direction=LineageDirection.DERIVED)
-            self.dataset_ids.update(new_ids)
+            # Already known - nothing to do.
+            return
+        # Check for cyclic dependencies before recording anything.
+        self._check_acyclic(rel.source_id, rel.derived_id)
+        self._relations_idx[ids] = rel.classifier
+        self.by_source.setdefault(rel.source_id, {})[rel.derived_id] = rel.classifier
+        self.by_derived.setdefault(rel.derived_id, {})[rel.source_id] = rel.classifier
+        self.dataset_ids.add(rel.derived_id)
+        self.dataset_ids.add(rel.source_id)
+
+    def _check_acyclic(self, source_id: UUID, derived_id: UUID) -> None:
+        """
+        Confirm that adding a source->derived relation keeps the collection acyclic.
+
+        Maintains a topological order of known datasets incrementally (Pearce-Kelly), so that only
+        the datasets between the two ends of an out-of-order relation are ever visited.
+
+        Raises InconsistentLineageException if the new relation would result in a cyclic dependency.
+        """
+        if source_id == derived_id:
+            raise InconsistentLineageException(f"LineageTrees must be acyclic: {source_id}")
+        order = self._order
+        if source_id not in order:
+            self._min_order -= 1
+            order[source_id] = self._min_order
+        if derived_id not in order:
+            self._max_order += 1
+            order[derived_id] = self._max_order
+        lower, upper = order[derived_id], order[source_id]
+        if upper < lower:
+            # Already consistent with the current order.
+            return
+        # Datasets derived (directly or indirectly) from derived_id that are currently ordered before source_id.
+        forward: list[UUID] = []
+        seen = {derived_id}
+        stack = [derived_id]
+        while stack:
+            node = stack.pop()
+            forward.append(node)
+            for child in self.by_source.get(node, {}):
+                if child == source_id:
+                    raise InconsistentLineageException(f"LineageTrees must be acyclic: {source_id}")
+                if child not in seen and order[child] < upper:
+                    seen.add(child)
+                    stack.append(child)
+        # Sources (directly or indirectly) of source_id that are currently ordered after derived_id.
+        backward: list[UUID] = []
+        seen = {source_id}
+        stack = [source_id]
+        while stack:
+            node = stack.pop()
+            backward.append(node)
+            for parent in self.by_derived.get(node, {}):
+                if parent not in seen and order[parent] > lower:
+                    seen.add(parent)
+                    stack.append(parent)
+        # Reassign the affected slots so that all of backward precedes all of forward.
+        forward.sort(key=order.__getitem__)
+        backward.sort(key=order.__getitem__)
+        slots = sorted(order[node] for node in backward + forward)
+        for node, slot in zip(backward + forward, slots):
+            order[node] = slot
+
+    def _check_acyclic_with(self, new_relations: Iterable[LineageIDPair]) -> None:
+        """
+        Confirm that adding new source->derived relations would keep the collection acyclic,
+        without modifying it.
+
+        Raises InconsistentLineageException if the new relations would result in a cyclic dependency.
+        """
+        order = self._order
+        new_by_source: dict[UUID, list[UUID]] = {}
+        consistent = True
+        for ids in new_relations:
+            if ids.source_id == ids.derived_id:
+                raise InconsistentLineageException(f"LineageTrees must be acyclic: {ids.source_id}")
+            new_by_source.setdefault(ids.source_id, []).append(ids.derived_id)
+            # Order slot zero is never assigned, so unknown datasets can all share it.
+            if consistent and not order.get(ids.source_id, 0) < order.get(ids.derived_id, 0):
+                consistent = False
+        if consistent:
+            # Every new relation agrees with the current topological order, so the union is acyclic.
+            return
+        # Depth-first search over existing and new relations together, from the derived end of each new relation.
+        on_path: set[UUID] = set()
+        done: set[UUID] = set()
+        for start in chain.from_iterable(new_by_source.values()):
+            if start in done:
+                continue
+            on_path.add(start)
+            stack = [(start, chain(self.by_source.get(start, ()), new_by_source.get(start, ())))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child in on_path:
+                        raise InconsistentLineageException(f"LineageTrees must be acyclic: {child}")
+                    if child not in done:
+                        on_path.add(child)
+                        stack.append((child, chain(self.by_source.get(child, ()), new_by_source.get(child, ()))))
+                        break
+                else:
+                    stack.pop()
+                    on_path.discard(node)
+                    done.add(node)
 
     def merge(self, pool: "LineageRelations") -> None:
         """
@@ -374,63 +505,67 @@ class LineageRelations:
 
         :param pool: The other LineageRelations object
         """
+        if not self._relations_idx and not self._homes:
+            # Nothing to be inconsistent with: copy pool's already-validated indexes wholesale
+            # rather than re-checking every relation.
+            self._homes = dict(pool._homes)
+            self._relations_idx = dict(pool._relations_idx)
+            self.by_source = {id_: dict(derived) for id_, derived in pool.by_source.items()}
+            self.by_derived = {id_: dict(sources) for id_, sources in pool.by_derived.items()}
+            self.dataset_ids = set(pool.dataset_ids)
+            self._order = dict(pool._order)
+            self._min_order = pool._min_order
+            self._max_order = pool._max_order
+            return
         for id_, home in pool._homes.items():
             self.merge_new_home(id_, home)
         for ids, classifier in pool._relations_idx.items():
             self._merge_new_relation(ids, classifier)
 
-    def merge_tree(self, tree: LineageTree,
-                   nodes: dict[UUID, LineageTree] | None = None,
-                   max_depth: int = 0) -> None:
+    def merge_tree(self, tree: LineageTree, max_depth: int = 0) -> None:
         """
         Merge in a LineageTree, ensuring it is consistent with the collection so far.
 
         Raises InconsistentLineageException if tree contains cyclic dependencies or inconsistent direction
 
         :param tree: The LineageTree to merge
-        :param parent_node: The parent node (used to mark recursive traversal - should be None on first call)
         :param max_depth: The depth to traverse the tree to.  default/zero = unlimited
         """
         # Check new tree is acyclic within itself
         tree.child_datasets()
-        if tree.home is not None:
-            self.merge_new_home(tree.dataset_id, tree.home)
-        # Determine recursion behaviour
-        recurse = True
-        next_max_depth = max_depth - 1
-        if nodes is None:
-            nodes = {}
-        if max_depth == 0:
-            next_max_depth = 0
-        elif max_depth == 1:
-            recurse = False
-        if tree.children:
-            if tree.dataset_id in nodes:
+        # Dataset ids of nodes merged with their children
+        nodes: set[UUID] = set()
+        # Work queue of (node, depth to traverse from node)
+        work = deque([(tree, max_depth)])
+        while work:
+            node, depth = work.popleft()
+            if node.home is not None:
+                self.merge_new_home(node.dataset_id, node.home)
+            # Determine recursion behaviour
+            recurse = True
+            next_depth = depth - 1
+            if depth == 0:
+                next_depth = 0
+            elif depth == 1:
+                recurse = False
+            if not node.children:
+                # Leaf node of original input tree.  Relations to it have already been checked for
+                # cyclic dependencies as they were merged.
+                continue
+            if node.dataset_id in nodes:
                 raise InconsistentLineageException("Duplicate nodes in LineageTree")
-            nodes[tree.dataset_id] = tree
-        else:
-            # tree.children is {} or None (i.e. leaf node of original input tree).
-            # Try to extract a reverse-direction tree to check for cyclic dependencies
-            self.extract_tree(tree.dataset_id, direction=tree.direction.opposite())
-        if tree.children is None:
-            return
-        # Perform recursion, as determined above
-        for classifier, children in tree.children.items():
-            for child in children:
-                if child.direction != tree.direction:
-                    raise InconsistentLineageException("Tree contains both derived and source nodes")
-                if tree.direction == LineageDirection.SOURCES:
-                    ids = LineageIDPair(derived_id=tree.dataset_id, source_id=child.dataset_id)
-                else:
-                    ids = LineageIDPair(derived_id=child.dataset_id, source_id=tree.dataset_id)
-                self._merge_new_relation(ids, classifier)
-                if recurse:
-                    self.merge_tree(
-                        child,
-                        nodes=nodes,
-                        max_depth=next_max_depth
-                    )
-        return
+            nodes.add(node.dataset_id)
+            for classifier, children in node.children.items():
+                for child in children:
+                    if child.direction != node.direction:
+                        raise InconsistentLineageException("Tree contains both derived and source nodes")
+                    if node.direction == LineageDirection.SOURCES:
+                        ids = LineageIDPair(derived_id=node.dataset_id, source_id=child.dataset_id)
+                    else:
+                        ids = LineageIDPair(derived_id=child.dataset_id, source_id=node.dataset_id)
+                    self._merge_new_relation(ids, classifier)
+                    if recurse:
+                        work.append((child, next_depth))
 
     def relations_diff(self,
                        existing_relations: Optional["LineageRelations"] = None,
@@ -460,35 +595,45 @@ class LineageRelations:
                 self._relations_idx, {},
                 self._homes, {}
             )
-        relations_to_add = {}
-        relations_to_update = {}
-        homes_to_add = {}
-        homes_to_update = {}
+        homes = self._homes
+        existing_homes = existing_relations._homes
+        relations = self._relations_idx
+        existing_rels = existing_relations._relations_idx
+        relations_to_update: dict[LineageIDPair, str] = {}
+        homes_to_update: dict[UUID, str] = {}
+        # Determine homes and relations to add
+        homes_to_add = {id_: homes[id_] for id_ in homes.keys() - existing_homes.keys()}
+        relations_to_add = {ids: relations[ids] for ids in relations.keys() - existing_rels.keys()}
 
         if not allow_updates:
-            # Ensure no inconsistencies
-            merged = LineageRelations(clone=self)
-            merged.merge(existing_relations)
-            # Determine homes and relations to add
-            for id_, home in self._homes.items():
-                if id_ not in existing_relations._homes:
-                    homes_to_add[id_] = home
-            for ids, classifier in self._relations_idx.items():
-                if ids not in existing_relations._relations_idx:
-                    relations_to_add[ids] = classifier
+            # Ensure no inconsistencies, scanning the smaller collection of each pair
+            for id_ in (homes.keys() if len(homes) <= len(existing_homes) else existing_homes.keys()):
+                if id_ in homes and id_ in existing_homes and homes[id_] and homes[id_] != existing_homes[id_]:
+                    raise InconsistentLineageException(f"Tree contains inconsistent homes for dataset {id_}")
+            small, large = (
+                (relations, existing_rels) if len(relations) <= len(existing_rels) else (existing_rels, relations)
+            )
+            for ids, classifier in small.items():
+                other = large.get(ids)
+                if other is not None and other != classifier:
+                    raise InconsistentLineageException(
+                        f"Dataset {ids.derived_id} is derived from {ids.source_id} with inconsistent classifiers."
+                    )
+            # Only the relations not already present can introduce a cycle.
+            if relations_to_add:
+                existing_relations._check_acyclic_with(relations_to_add)
         else:
-            # Determine homes to add and update
-            for id_, home in self._homes.items():
-                if id_ not in existing_relations._homes:
-                    homes_to_add[id_] = home
-                elif home != existing_relations._homes[id_]:
-                    homes_to_update[id_] = home
-            # Determine relations to add and update
-            for ids, classifier in self._relations_idx.items():
-                if ids not in existing_relations._relations_idx:
-                    relations_to_add[ids] = classifier
-                elif classifier != existing_relations._relations_idx[ids]:
-                    relations_to_update[ids] = classifier
+            # Determine homes and relations to update
+            homes_to_update = {
+                id_: homes[id_]
+                for id_ in homes.keys() & existing_homes.keys()
+                if homes[id_] != existing_homes[id_]
+            }
+            relations_to_update = {
+                ids: relations[ids]
+                for ids in relations.keys() & existing_rels.keys()
+                if relations[ids] != existing_rels[ids]
+            }
         return (
             relations_to_add, relations_to_update,
             homes_to_add, homes_to_update
@@ -497,51 +642,55 @@ class LineageRelations:
     def extract_tree(self,
                      root: UUID,
                      direction: LineageDirection = LineageDirection.SOURCES,
-                     parents: set[UUID] | None = None,
-                     so_far: set[UUID] | None = None,
                      ) -> LineageTree:
         """
         Extract a LineageTree from this LineageRelations collection.
 
-        Used to detect cyclic dependencies.
+        Where a dataset is reachable by more than one path (diamond dependencies), only the first
+        occurrence found carries its children.
+
+        Raises InconsistentLineageException if a cyclic dependency is encountered.
 
         :param root: The dataset id at the root of the extracted LineageTree
         :param direction: The direction of the extracted tree
-        :param parents: Used to detect cyclic dependencies in recursive mode
-                        - should be None on initial call.
-        :param so_far: Used to detect duplication from diamond dependencies in recursive mode
-                       - should be None on initial call.
         :return: the extracted LineageTree.
         """
         # Trees are extracted from the root down, so the leaf-up cycle-detection of tree.child_datasets
         # is insufficient here
-        if so_far is None:
-            so_far = set()
-        if parents is None:
-            parents = set()
-        if root in parents:
-            raise InconsistentLineageException(f"LineageTrees must be acyclic: {root}")
-        parents.add(root)
-        if root in so_far:
-            # Shortcut duplicates for handling diamond-dependencies
-            return LineageTree(dataset_id=root, direction=direction, home=self._homes.get(root))
-        so_far.add(root)
-
-        children: dict[str, list[LineageTree]] = {}
         if direction == LineageDirection.SOURCES:
-            subtrees = self.by_derived.get(root, {})
+            adjacency = self.by_derived
         else:
-            subtrees = self.by_source.get(root, {})
-        for dsid, classifier in subtrees.items():
-            subtree = self.extract_tree(dsid, direction, set(parents), so_far)
+            adjacency = self.by_source
+        homes = self._homes
+        children: dict[str, list[LineageTree]] = {}
+        tree = LineageTree(dataset_id=root, direction=direction, children=children, home=homes.get(root))
+        # Dataset ids extracted so far, for handling diamond-dependencies
+        so_far = {root}
+        # Dataset ids on the path from the root to the current node, for cycle detection
+        on_path = {root}
+        stack = [(root, children, iter(adjacency.get(root, {}).items()))]
+        while stack:
+            dsid, children, subtrees = stack[-1]
+            nxt = next(subtrees, None)
+            if nxt is None:
+                stack.pop()
+                on_path.discard(dsid)
+                continue
+            child_id, classifier = nxt
+            if child_id in on_path:
+                raise InconsistentLineageException(f"LineageTrees must be acyclic: {child_id}")
+            if child_id in so_far:
+                # Shortcut duplicates
+                subtree = LineageTree(dataset_id=child_id, direction=direction, home=homes.get(child_id))
+            else:
+                so_far.add(child_id)
+                on_path.add(child_id)
+                grandchildren: dict[str, list[LineageTree]] = {}
+                subtree = LineageTree(dataset_id=child_id, direction=direction,
+                                      children=grandchildren, home=homes.get(child_id))
+                stack.append((child_id, grandchildren, iter(adjacency.get(child_id, {}).items())))
             if classifier in children:
                 children[classifier].append(subtree)
             else:
                 children[classifier] = [subtree]
-        tree = LineageTree(
-            dataset_id=root,
-            direction=direction,
-            children=children,
-            home=self._homes.get(root)
-        )
         return tree
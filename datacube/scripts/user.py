@@ -21,6 +21,7 @@ from datacube.index.abstract import AbstractIndex
 
 _LOG = logging.getLogger('datacube-user')
 USER_ROLES = ('user', 'manage', 'admin')
+_ROLE_CHOICE = click.Choice(USER_ROLES, case_sensitive=False)
 
 
 @cli.group(name='user', help='User management commands')
@@ -83,7 +84,7 @@ def list_users(index, f):
 
 @user_cmd.command('grant')
 @click.argument('role',
-                type=click.Choice(USER_ROLES),
+                type=_ROLE_CHOICE,
                 nargs=1)
 @click.argument('users', nargs=-1)
 @ui.pass_index()
@@ -96,7 +97,7 @@ def grant(index, role, users):
 
 @user_cmd.command('create')
 @click.argument('role',
-                type=click.Choice(USER_ROLES), nargs=1)
+                type=_ROLE_CHOICE, nargs=1)
 @click.argument('user', nargs=1)
 @click.option('--description')
 @ui.pass_index()
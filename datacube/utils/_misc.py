@@ -5,7 +5,7 @@
 """
 Utility functions
 """
-import os
+import secrets
 import sys
 import logging
 from typing import Optional
@@ -20,8 +20,7 @@ def gen_password(num_random_bytes=12):
     """
     Generate random password
     """
-    import base64
-    return base64.urlsafe_b64encode(os.urandom(num_random_bytes)).decode('utf-8')
+    return secrets.token_urlsafe(num_random_bytes)
 
 
 def report_to_user(msg: str, logger: Optional[logging.Logger] = None, progress_indicator=False):
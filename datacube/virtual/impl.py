@@ -8,19 +8,24 @@ to query and to load data, and combinators to combine multiple products into "vi
 products implementing the same interface.
 """
 
+import functools
 from abc import ABC, abstractmethod
 from collections.abc import Mapping, Sequence
 
 from typing import Any, Dict, List, Optional, cast, Hashable
 from typing import Mapping as TypeMapping
 
+import os
+import threading
 import uuid
+import weakref
 import numpy
 import xarray
 import dask.array
-from dask.core import flatten
 import yaml
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 
 from datacube import Datacube
 from datacube.api.core import output_geobox
@@ -28,10 +33,12 @@ from datacube.api.query import Query, query_group_by
 from datacube.model import Measurement, Product
 from datacube.model.utils import xr_apply, xr_iter, SafeDumper
 from datacube.testutils.io import native_geobox
+from datacube.utils import cached_property
 from odc.geo.geobox import GeoBox, GeoboxTiles, geobox_union_conservative
 from odc.geo.warp import rio_reproject, resampling_s2rio
 from odc.geo.overlap import compute_reproject_roi, is_affine_st
 from odc.geo.xr import xr_coords
+from rasterio.enums import Resampling
 from datacube.api.core import per_band_load_data_settings
 
 from .utils import qualified_name, merge_dicts
@@ -42,6 +49,24 @@ class VirtualProductException(Exception):  # noqa: N818
     """ Raised if the construction of the virtual product cannot be validated. """
 
 
+def _memoize_measurements(method):
+    """
+    Remember the result of `output_measurements` (or a similar method returning a dictionary)
+    for the last `product_definitions` it was called with. Callers get a copy they are free to modify.
+    """
+    key = '_' + method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, product_definitions):
+        cached = self.__dict__.get(key)
+        if cached is None or cached[0] is not product_definitions:
+            cached = (product_definitions, method(self, product_definitions))
+            self.__dict__[key] = cached
+        return dict(cached[1])
+
+    return wrapper
+
+
 class VirtualDatasetBag:
     """ Result of `VirtualProduct.query`. """
     def __init__(self, bag, geopolygon, product_definitions):
@@ -90,7 +115,7 @@ class VirtualDatasetBag:
             yield VirtualDatasetBag(child, self.geopolygon, self.product_definitions)
 
     def __repr__(self):
-        return "<VirtualDatasetBag of {} datacube datasets>".format(len(list(self.contained_datasets())))
+        return "<VirtualDatasetBag of {} datacube datasets>".format(sum(1 for _ in self.contained_datasets()))
 
 
 class VirtualDatasetBox:
@@ -157,47 +182,58 @@ class VirtualDatasetBox:
                                  geopolygon=self.geopolygon)
 
     def filter(self, predicate):
-        mask = self.map(predicate, dtype='bool')
+        # a plain boolean array is enough to index by position, no need for an aligned DataArray
+        mask = xr_apply(self.box, predicate, dtype='bool').values
 
         # NOTE: this could possibly result in an empty box
-        return VirtualDatasetBox(self.box[mask.box], self.geobox, self.load_natively, self.product_definitions,
+        return VirtualDatasetBox(self.box[mask], self.geobox, self.load_natively, self.product_definitions,
                                  geopolygon=self.geopolygon)
 
     def split(self, dim='time'):
         box = self.box
 
         [length] = box[dim].shape
+        axis = box.dims.index(dim)
+        # bypass the generic indexing machinery when only dimension coordinates need slicing
+        fast = set(box.coords) <= set(box.dims)
         for i in range(length):
-            yield VirtualDatasetBox(box.isel(**{dim: slice(i, i + 1)}),
+            if fast:
+                sliced = _fast_slice(box, tuple(slice(i, i + 1) if k == axis else slice(None)
+                                                for k in range(box.ndim)))
+            else:
+                sliced = box.isel(**{dim: slice(i, i + 1)})
+            yield VirtualDatasetBox(sliced,
                                     self.geobox,
                                     self.load_natively,
                                     self.product_definitions,
                                     geopolygon=self.geopolygon)
 
     def input_datasets(self):
-        def traverse(entry):
-            if isinstance(entry, Mapping):
-                if 'collate' in entry:
-                    _, child = entry['collate']
-                    yield from traverse(child)
-                elif 'juxtapose' in entry:
-                    for child in entry['juxtapose']:
-                        yield from traverse(child)
+        def worker(index, entry):
+            datasets = set()
+            stack = [entry]
+            while stack:
+                entry = stack.pop()
+                if isinstance(entry, Mapping):
+                    if 'collate' in entry:
+                        _, child = entry['collate']
+                        stack.append(child)
+                    elif 'juxtapose' in entry:
+                        stack.extend(entry['juxtapose'])
+                    else:
+                        raise VirtualProductException("malformed box")
+
+                elif isinstance(entry, Sequence):
+                    datasets.update(entry)
+
+                elif isinstance(entry, VirtualDatasetBox):
+                    for _, _, child in xr_iter(entry.input_datasets()):
+                        datasets.update(child)
+
                 else:
                     raise VirtualProductException("malformed box")
 
-            elif isinstance(entry, Sequence):
-                yield from entry
-
-            elif isinstance(entry, VirtualDatasetBox):
-                for _, _, child in xr_iter(entry.input_datasets()):
-                    yield from child
-
-            else:
-                raise VirtualProductException("malformed box")
-
-        def worker(index, entry):
-            return set(traverse(entry))
+            return datasets
 
         return self.map(worker).box
 
@@ -246,7 +282,8 @@ class VirtualProduct(Mapping):
 
     _GEOBOX_KEYS = {'output_crs', 'resolution', 'align'}
     _GROUPING_KEYS = {'group_by'}
-    _LOAD_KEYS = {'measurements', 'fuse_func', 'resampling', 'dask_chunks', 'like', 'skip_broken_datasets'}
+    _LOAD_KEYS = {'measurements', 'fuse_func', 'resampling', 'dask_chunks', 'like', 'skip_broken_datasets',
+                  'fetch_workers'}
     _ADDITIONAL_SEARCH_KEYS = {'dataset_predicate', 'ensure_location'}
 
     _NON_QUERY_KEYS = _GEOBOX_KEYS | _GROUPING_KEYS | _LOAD_KEYS
@@ -299,10 +336,15 @@ class VirtualProduct(Mapping):
         """ Convert grouped datasets to `xarray.Dataset`. """
         raise NotImplementedError
 
-    def __repr__(self):
+    @cached_property
+    def _yaml(self):
+        # recipes are not modified after validation
         return yaml.dump(self._reconstruct(), Dumper=SafeDumper,
                          default_flow_style=False, indent=2)
 
+    def __repr__(self):
+        return self._yaml
+
     def load(self, dc: Datacube, **query: Dict[str, Any]) -> xarray.Dataset:
         """ Mimic `datacube.Datacube.load`. For illustrative purposes. May be removed in the future. """
         datasets = self.query(dc, **query)
@@ -406,7 +448,7 @@ class Product(VirtualProduct):  # type: ignore[no-redef]
             dataset_geobox = geobox_union_conservative([native_geobox(ds,
                                                                       measurements=canonical_names,
                                                                       basis=merged.get('like'))
-                                                        for ds in grouped.box.sum().item()])
+                                                        for ds in chain.from_iterable(grouped.box.values.ravel())])
 
             if grouped.geopolygon is not None:
                 reproject_roi = compute_reproject_roi(dataset_geobox,
@@ -438,7 +480,7 @@ class Product(VirtualProduct):  # type: ignore[no-redef]
 class Transform(VirtualProduct):
     """ An on-the-fly transformation. """
 
-    @property
+    @cached_property
     def _transformation(self) -> Transformation:
         """ The `Transformation` object associated with a transform product. """
         cls = self['transform']
@@ -452,7 +494,7 @@ class Transform(VirtualProduct):
 
         return cast(Transformation, obj)
 
-    @property
+    @cached_property
     def _input(self) -> VirtualProduct:
         """ The input product of a transform product. """
         return from_validated_recipe(self['input'])
@@ -462,6 +504,7 @@ class Transform(VirtualProduct):
         return dict(transform=qualified_name(self['transform']),
                     input=self._input._reconstruct(), **reject_keys(self, ['input', 'transform']))
 
+    @_memoize_measurements
     def output_measurements(self, product_definitions: Dict[str, Product]) -> Dict[str, Measurement]:
         input_measurements = self._input.output_measurements(product_definitions)
 
@@ -485,7 +528,7 @@ class Transform(VirtualProduct):
 class Aggregate(VirtualProduct):
     """ A (non-spatial) statistic of grouped data. """
 
-    @property
+    @cached_property
     def _statistic(self) -> Transformation:
         """ The `Transformation` object associated with an aggregate product. """
         cls = self['aggregate']
@@ -500,7 +543,7 @@ class Aggregate(VirtualProduct):
 
         return cast(Transformation, obj)
 
-    @property
+    @cached_property
     def _input(self) -> VirtualProduct:
         """ The input product of a transform product. """
         return from_validated_recipe(self['input'])
@@ -512,6 +555,7 @@ class Aggregate(VirtualProduct):
                     input=self._input._reconstruct(),
                     **reject_keys(self, ['input', 'aggregate', 'group_by']))
 
+    @_memoize_measurements
     def output_measurements(self, product_definitions: Dict[str, Product]) -> Dict[str, Measurement]:
         input_measurements = self._input.output_measurements(product_definitions)
 
@@ -540,11 +584,11 @@ class Aggregate(VirtualProduct):
     def fetch(self, grouped: VirtualDatasetBox, **load_settings: Dict[str, Any]) -> xarray.Dataset:
         dim = self.get('dim', 'time')
 
-        def xr_map(array, func):
-            # convenient function close to `xr_apply` in spirit
+        def xr_items(array):
+            # convenient function close to `xr_iter` in spirit
             coords = {key: value.values for key, value in array.coords.items()}
             for i in numpy.ndindex(array.shape):
-                yield func({key: value[i] for key, value in coords.items()}, array.values[i])
+                yield {key: value[i] for key, value in coords.items()}, array.values[i]
 
         def statistic(coords, value):
             data = self._input.fetch(value, **load_settings)
@@ -553,7 +597,8 @@ class Aggregate(VirtualProduct):
             result = result.drop_indexes(dim, errors="ignore")
             return result
 
-        groups = list(xr_map(grouped.box, statistic))
+        groups = _fetch_all([functools.partial(statistic, coords, value)
+                             for coords, value in xr_items(grouped.box)], load_settings)
         result = xarray.concat(groups, dim=dim).assign_attrs(**select_unique([g.attrs for g in groups]))
         result.coords[dim].attrs.update(grouped.box[dim].attrs)
         return result
@@ -562,7 +607,7 @@ class Aggregate(VirtualProduct):
 class Collate(VirtualProduct):
     """ Stack observations from products with the same set of measurements. """
 
-    @property
+    @cached_property
     def _children(self) -> List[VirtualProduct]:
         """ The children of a collate product. """
         return [from_validated_recipe(child) for child in self['collate']]
@@ -572,6 +617,7 @@ class Collate(VirtualProduct):
         children = [child._reconstruct() for child in self._children]
         return dict(collate=children, **reject_keys(self, ['collate']))
 
+    @_memoize_measurements
     def output_measurements(self, product_definitions: Dict[str, Product]) -> Dict[str, Measurement]:
         input_measurement_list = [child.output_measurements(product_definitions)
                                   for child in self._children]
@@ -588,6 +634,8 @@ class Collate(VirtualProduct):
 
         self._assert(name not in first, "source index measurement '{}' already present".format(name))
 
+        # do not modify the child's (possibly shared) measurements
+        first = dict(first)
         first.update({name: Measurement(name=name, dtype='int8', nodata=-1, units='1')})
         return first
 
@@ -617,20 +665,14 @@ class Collate(VirtualProduct):
                   in enumerate(zip(self._children, datasets.bag['collate']))]
 
         dim = self.get('dim', 'time')
-        return VirtualDatasetBox(xarray.concat([grouped.box for grouped in groups
-                                                if grouped.box.shape[0] > 0], dim=dim).sortby(dim),
-                                 select_unique([grouped.geobox for grouped in groups]),
-                                 select_unique([grouped.load_natively for grouped in groups]),
-                                 merge_dicts([grouped.product_definitions for grouped in groups]),
-                                 geopolygon=select_unique([grouped.geopolygon for grouped in groups]))
+        return _combine_boxes(xarray.concat([grouped.box for grouped in groups
+                                             if grouped.box.shape[0] > 0], dim=dim).sortby(dim),
+                              groups)
 
     def fetch(self, grouped: VirtualDatasetBox, **load_settings: Dict[str, Any]) -> xarray.Dataset:
-        def is_from(source_index):
-            def result(_, value):
-                self._assert('collate' in value, "malformed dataset box in collate")
-                return value['collate'][0] == source_index
-
-            return result
+        def source_of(value):
+            self._assert('collate' in value, "malformed dataset box in collate")
+            return value['collate'][0]
 
         def strip_source(_, value):
             return value['collate'][1]
@@ -646,26 +688,42 @@ class Collate(VirtualProduct):
                 if name is None:
                     return result
 
-                # implication for dask?
                 measurement = Measurement(name=name, dtype='int8', nodata=-1, units='1')
                 shape = select_unique([result[band].shape for band in result.data_vars])
-                array = numpy.full(shape, source_index, dtype=measurement.dtype)
                 first = result[list(result.data_vars)[0]]
+                if isinstance(first.data, dask.array.Array):
+                    array = dask.array.full(shape, source_index, dtype=measurement.dtype, chunks=first.data.chunks)
+                else:
+                    # read-only constant view, the concatenation below makes the actual copy
+                    array = numpy.broadcast_to(numpy.array(source_index, dtype=measurement.dtype), shape)
                 result[name] = xarray.DataArray(array, dims=first.dims, coords=first.coords,
                                                 name=name).assign_attrs(units=measurement.units,
                                                                         nodata=measurement.nodata)
                 return result
 
-        groups = [fetch_child(child, source_index, grouped.filter(is_from(source_index)).map(strip_source))
-                  for source_index, child in enumerate(self._children)]
+        # split the box by source in one pass, rather than filtering it once per child
+        values = grouped.box.values
+        sources = numpy.fromiter(map(source_of, values.flat), dtype='int', count=values.size).reshape(values.shape)
+        stripped = grouped.map(strip_source)
+
+        def from_source(source_index):
+            # NOTE: this could possibly result in an empty box
+            return VirtualDatasetBox(stripped.box[sources == source_index], grouped.geobox,
+                                     grouped.load_natively, grouped.product_definitions,
+                                     geopolygon=grouped.geopolygon)
+
+        groups = _fetch_all([functools.partial(fetch_child, child, source_index, from_source(source_index))
+                             for source_index, child in enumerate(self._children)], load_settings)
 
         non_empty = [g for g in groups if g is not None]
 
         dim = self.get('dim', 'time')
 
-        result = xarray.concat(non_empty,
-                               dim=dim).sortby(dim).assign_attrs(**select_unique([g.attrs
-                                                                                  for g in non_empty]))
+        result = xarray.concat(non_empty, dim=dim)
+        if not result.indexes[dim].is_monotonic_increasing:
+            # sorting copies every band, so only do it when needed
+            result = result.sortby(dim)
+        result = result.assign_attrs(**select_unique([g.attrs for g in non_empty]))
 
         # concat and sortby mess up chunking
         if 'dask_chunks' not in load_settings or dim not in load_settings['dask_chunks']:
@@ -676,7 +734,7 @@ class Collate(VirtualProduct):
 class Juxtapose(VirtualProduct):
     """ Put measurements from different products side-by-side. """
 
-    @property
+    @cached_property
     def _children(self) -> List[VirtualProduct]:
         """ The children of a juxtapose product. """
         return [from_validated_recipe(child) for child in self['juxtapose']]
@@ -686,13 +744,14 @@ class Juxtapose(VirtualProduct):
         children = [child._reconstruct() for child in self._children]
         return dict(juxtapose=children, **reject_keys(self, ['juxtapose']))
 
+    @_memoize_measurements
     def output_measurements(self, product_definitions: Dict[str, Product]) -> Dict[str, Measurement]:
         input_measurement_list = [child.output_measurements(product_definitions)
                                   for child in self._children]
 
         result = cast(Dict[str, Measurement], {})
         for measurements in input_measurement_list:
-            common = set(result) & set(measurements)
+            common = result.keys() & measurements.keys()
             self._assert(not common, "common measurements {} between children".format(common))
 
             result.update(measurements)
@@ -717,14 +776,14 @@ class Juxtapose(VirtualProduct):
 
         aligned_boxes = xarray.align(*[grouped.box for grouped in groups])
 
-        def tuplify(indexes, _):
-            return {'juxtapose': [box.sel(**indexes).item() for box in aligned_boxes]}
+        # aligned boxes share their coordinates, so cells can be matched up by position
+        first = aligned_boxes[0]
+        raw = [box.transpose(*first.dims).values for box in aligned_boxes]
+        tuples = numpy.empty(first.shape, dtype='O')
+        for i in numpy.ndindex(first.shape):
+            tuples[i] = {'juxtapose': [values[i] for values in raw]}
 
-        return VirtualDatasetBox(xr_apply(aligned_boxes[0], tuplify),
-                                 select_unique([grouped.geobox for grouped in groups]),
-                                 select_unique([grouped.load_natively for grouped in groups]),
-                                 merge_dicts([grouped.product_definitions for grouped in groups]),
-                                 geopolygon=select_unique([grouped.geopolygon for grouped in groups]))
+        return _combine_boxes(xarray.DataArray(tuples, coords=first.coords, dims=first.dims), groups)
 
     def fetch(self, grouped: VirtualDatasetBox, **load_settings: Dict[str, Any]) -> xarray.Dataset:
         def select_child(source_index):
@@ -740,8 +799,8 @@ class Juxtapose(VirtualProduct):
                                      grouped.load_natively, grouped.product_definitions,
                                      geopolygon=grouped.geopolygon)
 
-        groups = [child.fetch(fetch_recipe(source_index), **load_settings)
-                  for source_index, child in enumerate(self._children)]
+        groups = _fetch_all([functools.partial(child.fetch, fetch_recipe(source_index), **load_settings)
+                             for source_index, child in enumerate(self._children)], load_settings)
 
         return xarray.merge(groups).assign_attrs(**select_unique([g.attrs for g in groups]))
 
@@ -749,9 +808,11 @@ class Juxtapose(VirtualProduct):
 class Reproject(VirtualProduct):
     """
     On-the-fly reprojection of raster data.
+
+    Optional recipe keys ``num_threads`` and ``warp_mem_limit`` (in MB) are passed on to the GDAL warper.
     """
 
-    @property
+    @cached_property
     def _input(self) -> "VirtualProduct":
         """ The input product of a transform product. """
         return from_validated_recipe(self["input"])
@@ -760,6 +821,7 @@ class Reproject(VirtualProduct):
         # pylint: disable=protected-access
         return dict(input=self._input._reconstruct(), **reject_keys(self, ["input"]))
 
+    @_memoize_measurements
     def output_measurements(self, product_definitions: Dict[str, Product]) -> Dict[str, Measurement]:
         """
         A dictionary mapping names to measurement metadata.
@@ -767,6 +829,15 @@ class Reproject(VirtualProduct):
         """
         return self._input.output_measurements(product_definitions)
 
+    @_memoize_measurements
+    def _resampling_methods(self, product_definitions: Dict[str, Product]) -> Dict[str, Any]:
+        """ The resampling method for each output measurement. """
+        measurements = self.output_measurements(product_definitions)
+        return {name: settings['resampling_method']
+                for name, settings in zip(measurements,
+                                          per_band_load_data_settings(measurements,
+                                                                      resampling=self.get('resampling', 'nearest')))}
+
     def query(self, dc: Datacube, **search_terms: Dict[str, Any]) -> VirtualDatasetBag:
         """ Collection of datasets that match the query. """
         return self._input.query(dc, **reject_keys(search_terms, self._GEOBOX_KEYS))
@@ -806,18 +877,15 @@ class Reproject(VirtualProduct):
 
         geobox = grouped.geobox
 
-        measurements = self.output_measurements(grouped.product_definitions)
-
-        band_settings = dict(zip(list(measurements),
-                                 per_band_load_data_settings(measurements,
-                                                             resampling=self.get('resampling', 'nearest'))))
+        resampling_methods = self._resampling_methods(grouped.product_definitions)
 
         boxes = [VirtualDatasetBox(box_slice.box, None, True, box_slice.product_definitions, geopolygon=geobox.extent)
                  for box_slice in grouped.split()]
 
         dask_chunks = load_settings.get('dask_chunks')
         if dask_chunks is None:
-            rasters = [self._input.fetch(box, **load_settings) for box in boxes]
+            rasters = _fetch_all([functools.partial(self._input.fetch, box, **load_settings) for box in boxes],
+                                 load_settings)
         else:
             rasters = [self._input.fetch(box, dask_chunks={key: 1 for key in dask_chunks if key not in geobox.dims},
                                          **reject_keys(load_settings, ['dask_chunks']))
@@ -829,23 +897,108 @@ class Reproject(VirtualProduct):
         coords: Mapping[Hashable, xarray.DataArray] = OrderedDict(**xr_coords(geobox, spatial_ref))
         result.coords.update(coords)
 
-        for measurement in measurements:
-            result[measurement] = xarray.concat([reproject_band(raster[measurement],
-                                                                geobox,
-                                                                band_settings[measurement]['resampling_method'],
-                                                                grouped.box.dims + geobox.dims,
-                                                                dask_chunks)
-                                                 for raster in rasters], dim='time')
+        dims = grouped.box.dims + geobox.dims
+        num_threads = self.get('num_threads')
+        warp_mem_limit = self.get('warp_mem_limit')
+
+        outputs = {}
+        warps = []
+        for measurement, resampling in resampling_methods.items():
+            bands = [raster[measurement] for raster in rasters]
+
+            if dask_chunks is None:
+                # each time slice is warped straight into its place in the output
+                data = numpy.empty((len(bands),) + tuple(geobox.shape), dtype=bands[0].dtype)
+                warps.extend((band, resampling, data[index:index + 1]) for index, band in enumerate(bands))
+            else:
+                data = dask.array.concatenate([_reproject_dask_array(band, geobox, resampling, dask_chunks,
+                                                                     num_threads, warp_mem_limit)
+                                               for band in bands])
+
+            outputs[measurement] = (data, bands[0].attrs)
+
+        if warps:
+            # warps that run concurrently share the CPUs
+            threads = num_threads or max(1, (os.cpu_count() or 1) // _fetch_workers(warps, load_settings))
+            _fetch_all([functools.partial(reproject_array, band.data, band.nodata, band.geobox, geobox, resampling,
+                                          num_threads=threads, warp_mem_limit=warp_mem_limit, dst=dst)
+                        for band, resampling, dst in warps], load_settings)
+
+        for measurement, (data, attrs) in outputs.items():
+            result[measurement] = _reprojected_dataarray(data, attrs, result.coords['time'], geobox, dims)
 
         result.attrs['crs'] = geobox.crs
         return result
 
 
-def reproject_band(band, geobox, resampling, dims, dask_chunks=None):
-    """ Reproject a single measurement to the geobox. """
+_FETCH_WORKER = threading.local()
+
+
+def _fetch_workers(fetches, load_settings):
+    """ How many of the `fetches` `_fetch_all` runs at a time. """
+    if load_settings.get('dask_chunks') is not None or getattr(_FETCH_WORKER, 'active', False):
+        return 1
+    return max(1, min(load_settings.get('fetch_workers', 1), len(fetches)))
+
+
+def _fetch_all(fetches, load_settings):
+    """
+    Call each of the independent `fetches` (functions of no arguments) and return their results in order.
+
+    Eager loads run on up to ``fetch_workers`` threads (a load setting, default 1) so that their I/O overlaps.
+    Fetches running on those threads do not start threads of their own, keeping the total within the budget.
+    Lazy loads only build dask graphs, and are not run concurrently.
+    """
+    workers = _fetch_workers(fetches, load_settings)
+    if workers == 1:
+        return [fetch() for fetch in fetches]
+
+    def run(fetch):
+        _FETCH_WORKER.active = True
+        try:
+            return fetch()
+        finally:
+            _FETCH_WORKER.active = False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, fetches))
+
+
+def _combine_boxes(box, groups):
+    """ Wrap the combined `box` of the children's `groups` with their (shared) metadata. """
+    geoboxes, load_natively, product_definitions, geopolygons = [], [], [], []
+    for grouped in groups:
+        geoboxes.append(grouped.geobox)
+        load_natively.append(grouped.load_natively)
+        product_definitions.append(grouped.product_definitions)
+        geopolygons.append(grouped.geopolygon)
+
+    return VirtualDatasetBox(box,
+                             select_unique(geoboxes),
+                             select_unique(load_natively),
+                             merge_dicts(product_definitions),
+                             geopolygon=select_unique(geopolygons))
+
+
+def reproject_band(band, geobox, resampling, dims, dask_chunks=None, num_threads=None, warp_mem_limit=None):
+    """
+    Reproject a single measurement to the geobox.
+
+    Without dask, the warp uses ``num_threads`` threads (default: all CPUs). With dask, tiles are
+    already warped in parallel, so each tile uses ``num_threads`` threads (default: one).
+    """
     if not hasattr(band.data, 'dask') or dask_chunks is None:
-        data = reproject_array(band.data, band.nodata, band.geobox, geobox, resampling)
-        return wrap_in_dataarray(data, band, geobox, dims)
+        data = reproject_array(band.data, band.nodata, band.geobox, geobox, resampling,
+                               num_threads=num_threads or os.cpu_count(), warp_mem_limit=warp_mem_limit)
+    else:
+        data = _reproject_dask_array(band, geobox, resampling, dask_chunks, num_threads, warp_mem_limit)
+
+    return wrap_in_dataarray(data, band, geobox, dims)
+
+
+def _reproject_dask_array(band, geobox, resampling, dask_chunks, num_threads, warp_mem_limit):
+    """ The dask array of `band` (a dask-backed measurement) reprojected to the geobox in tiles of `dask_chunks`. """
+    warp = functools.partial(reproject_array, num_threads=num_threads, warp_mem_limit=warp_mem_limit)
 
     dask_name = 'warp_{name}-{token}'.format(name=band.name, token=uuid.uuid4().hex)
     dependencies = [band.data]
@@ -853,60 +1006,162 @@ def reproject_band(band, geobox, resampling, dims, dask_chunks=None):
     spatial_chunks = tuple(dask_chunks.get(k, geobox.shape[i])
                            for i, k in enumerate(geobox.dims))
 
-    gt = GeoboxTiles(geobox, spatial_chunks)
-    new_layer = {}
+    # the non-spatial dimensions (of length one) are kept as a single chunk
+    non_spatial_shape = band.shape[:-2]
+    non_spatial_index = (0,) * len(non_spatial_shape)
 
-    for tile_index in numpy.ndindex(gt.shape):
-        sub_geobox = gt[tile_index]
-        # find the input array slice from the output geobox
-        reproject_roi = compute_reproject_roi(band.geobox, sub_geobox, padding=1)
+    new_layer = {}
 
+    for tile_index, sub_geobox, roi_src in _reproject_tile_plan(band.geobox, geobox, spatial_chunks):
         # find the chunk from the input array with the slice index
-        subset_band = band[(...,) + reproject_roi.roi_src].chunk(-1)
+        subset_band = band[(...,) + roi_src].chunk(-1)
 
         if min(subset_band.shape) == 0:
             # pad the empty chunk
-            new_layer[(dask_name,) + tile_index] = (numpy.full, sub_geobox.shape, band.nodata, band.dtype)
+            new_layer[(dask_name,) + non_spatial_index + tile_index] = (numpy.full,
+                                                                        non_spatial_shape + tuple(sub_geobox.shape),
+                                                                        band.nodata, band.dtype)
         else:
             # next 3 lines to generate the new graph
             dependencies.append(subset_band.data)
-            # get the input dask array for the function `reproject_array`
-            band_key = list(flatten(subset_band.data.__dask_keys__()))[0]
+            # get the input dask array for the function `reproject_array`, the only chunk after rechunking
+            band_key = (subset_band.data.name,) + (0,) * subset_band.ndim
             # generate a new layer of dask graph with reroject
-            new_layer[(dask_name,) + tile_index] = (reproject_array,
-                                                    band_key, band.nodata, subset_band.geobox, sub_geobox, resampling)
+            new_layer[(dask_name,) + non_spatial_index + tile_index] = (warp,
+                                                                        band_key, band.nodata, subset_band.geobox,
+                                                                        sub_geobox, resampling)
 
     # create a new graph with the additional layer and pack the graph into dask.array
     # since only regular chunking is allowed at the higher level dask.array interface,
     # to manipulate the graph seems to be the easiest way to obtain a dask.array with irregular chunks after reproject
-    data = dask.array.Array(band.data.dask.from_collections(dask_name, new_layer, dependencies=dependencies),
+    return dask.array.Array(band.data.dask.from_collections(dask_name, new_layer, dependencies=dependencies),
                             dask_name,
-                            chunks=spatial_chunks,
+                            chunks=non_spatial_shape + spatial_chunks,
                             dtype=band.dtype,
-                            shape=gt.base.shape)
+                            shape=non_spatial_shape + tuple(geobox.shape))
 
-    return wrap_in_dataarray(data, band, geobox, dims)
+
+@functools.lru_cache(maxsize=32)
+def _reproject_tile_plan(src_geobox, dst_geobox, spatial_chunks):
+    """
+    Split `dst_geobox` into tiles of `spatial_chunks` and find the source pixels each tile needs.
+    Bands (and time slices) that share their geoboxes share the plan.
+    """
+    gt = GeoboxTiles(dst_geobox, spatial_chunks)
+    plan = []
+    for tile_index in numpy.ndindex(*gt.shape):
+        sub_geobox = gt[tile_index]
+        # find the input array slice from the output geobox
+        plan.append((tile_index, sub_geobox, _reproject_roi_src(src_geobox, sub_geobox, padding=1)))
+    return tuple(plan)
 
 
-def reproject_array(src, nodata, s_geobox, d_geobox, resampling):
-    """ Reproject a numpy array. """
-    dst = numpy.full(d_geobox.shape, fill_value=nodata, dtype=src.dtype)
+def _reproject_roi_src(src_geobox, dst_geobox, padding):
+    """
+    The slice of the source pixels that `dst_geobox` needs. For geoboxes in the same CRS the
+    pixel transform is affine, so the corners of `dst_geobox` suffice to find it.
+    """
+    if src_geobox.crs != dst_geobox.crs:
+        return compute_reproject_roi(src_geobox, dst_geobox, padding=padding).roi_src
+
+    # destination pixel to source pixel
+    transform = ~src_geobox.affine * dst_geobox.affine
+    height, width = dst_geobox.shape
+    xs, ys = zip(*(transform * corner for corner in [(0, 0), (width, 0), (0, height), (width, height)]))
+
+    def window(low, high, size):
+        # err on the side of a larger window when the corners fall (almost) on pixel edges
+        start = int(numpy.floor(low - 1e-6)) - padding
+        stop = int(numpy.ceil(high + 1e-6)) + padding
+        return slice(min(max(start, 0), size), min(max(stop, 0), size))
+
+    return (window(min(ys), max(ys), src_geobox.shape[0]), window(min(xs), max(xs), src_geobox.shape[1]))
+
+
+def reproject_array(src, nodata, s_geobox, d_geobox, resampling, num_threads=None, warp_mem_limit=None, dst=None):
+    """ Reproject a numpy array, into `dst` if given. """
+    if dst is None:
+        dst = numpy.empty(src.shape[:-2] + tuple(d_geobox.shape), dtype=src.dtype)
+
+    if _all_nodata(src, nodata):
+        # nothing to warp, e.g. a tile beyond the edge of the scene
+        dst[...] = nodata
+        return dst
+
+    resampling = resampling_s2rio(resampling)
+    if resampling == Resampling.nearest and nodata is not None and s_geobox.crs == d_geobox.crs:
+        # destination pixel to source pixel
+        transform = ~s_geobox.affine * d_geobox.affine
+        if is_affine_st(transform):
+            _nearest_st(src, nodata, transform, dst)
+            return dst
+
+    # GDAL fills the pixels it does not map with nodata (INIT_DEST=NO_DATA)
     rio_reproject(src=src, dst=dst,
                   s_gbox=s_geobox, d_gbox=d_geobox,  # TODO: rename s_gbox and d_gbox once odc-geo has been updated
-                  resampling=resampling_s2rio(resampling),
+                  resampling=resampling,
                   src_nodata=nodata,
-                  dst_nodata=nodata)
+                  dst_nodata=nodata,
+                  init_dest_nodata=True,
+                  num_threads=num_threads,
+                  warp_mem_limit=warp_mem_limit)
     return dst
 
 
+def _nearest_st(src, nodata, transform, dst):
+    """
+    Nearest neighbour resampling of `src` into `dst` when the pixel `transform` between them
+    is only scale and translation: a gather of whole rows and columns, without calling GDAL.
+    """
+    rows = _nearest_indices(transform.e, transform.f, dst.shape[-2])
+    cols = _nearest_indices(transform.a, transform.c, dst.shape[-1])
+
+    # the indices are monotonic so the part of `dst` inside `src` is a window
+    row_slice, rows = _valid_window(rows, src.shape[-2])
+    col_slice, cols = _valid_window(cols, src.shape[-1])
+
+    dst[..., row_slice, col_slice] = src[..., rows[:, None], cols[None, :]]
+
+    # fill the border around that window
+    dst[..., :row_slice.start, :] = nodata
+    dst[..., row_slice.stop:, :] = nodata
+    dst[..., row_slice, :col_slice.start] = nodata
+    dst[..., row_slice, col_slice.stop:] = nodata
+
+
+def _nearest_indices(scale, offset, size):
+    # same rounding as the nearest neighbour kernel of GDAL
+    return numpy.floor(scale * (numpy.arange(size) + 0.5) + offset + 1e-10).astype('int64')
+
+
+def _valid_window(indices, src_size):
+    valid = numpy.flatnonzero((indices >= 0) & (indices < src_size))
+    if len(valid) == 0:
+        return slice(0, 0), indices[:0]
+    return slice(valid[0], valid[-1] + 1), indices[valid[0]:valid[-1] + 1]
+
+
+def _all_nodata(array, nodata):
+    """ Whether every pixel of `array` is `nodata`. """
+    if nodata is None:
+        return False
+    if numpy.isnan(nodata):
+        return bool(numpy.isnan(array).all())
+    return bool((array == nodata).all())
+
+
 def wrap_in_dataarray(reprojected_data, src_band, dst_geobox, dims):
     """ Wrap the reproject numpy array in a `xarray.DataArray` with relevant metadata. """
     non_spatial_shape = src_band.shape[:-2]
     assert all(x == 1 for x in non_spatial_shape)
 
-    result = xarray.DataArray(data=reprojected_data.reshape(non_spatial_shape + dst_geobox.shape),
-                              dims=dims, attrs=src_band.attrs)
-    result.coords['time'] = src_band.coords['time']
+    return _reprojected_dataarray(reprojected_data.reshape(non_spatial_shape + dst_geobox.shape),
+                                  src_band.attrs, src_band.coords['time'], dst_geobox, dims)
+
+
+def _reprojected_dataarray(data, attrs, time, dst_geobox, dims):
+    result = xarray.DataArray(data=data, dims=dims, attrs=attrs)
+    result.coords['time'] = time
 
     for name, coord in dst_geobox.coordinates.items():
         result.coords[name] = (name, coord.values, {'units': coord.units, 'resolution': coord.resolution})
@@ -926,10 +1181,21 @@ def virtual_product_kind(recipe):
     return candidates[0]
 
 
+# virtual products by the id of their recipe, so that recipes referenced more than once share one instance
+# (each virtual product holds on to its recipe, so the id cannot be reused while the entry is alive)
+_FROM_RECIPE_CACHE: "weakref.WeakValueDictionary[int, VirtualProduct]" = weakref.WeakValueDictionary()
+
+
 def from_validated_recipe(recipe):
+    cached = _FROM_RECIPE_CACHE.get(id(recipe))
+    if cached is not None and cached._settings is recipe:  # pylint: disable=protected-access
+        return cached
+
     lookup = dict(product=Product, transform=Transform, collate=Collate,
                   juxtapose=Juxtapose, aggregate=Aggregate, reproject=Reproject)
-    return lookup[virtual_product_kind(recipe)](recipe)
+    result = lookup[virtual_product_kind(recipe)](recipe)
+    _FROM_RECIPE_CACHE[id(recipe)] = result
+    return result
 
 
 def _fast_slice(array, indexers):
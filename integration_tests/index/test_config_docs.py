@@ -406,6 +406,31 @@ def test_product_delete(index, ls8_eo3_product: Product):
     assert not _object_exists(index, "dv_ga_ls8c_ard_3_dataset")
 
 
+@pytest.mark.parametrize('datacube_env_name', ('postgis', ))
+def test_delete_datasets_for_product(index: Index,
+                                     ls8_eo3_product: Product, ls8_eo3_dataset, ls8_eo3_dataset2,
+                                     wo_eo3_product: Product, wo_eo3_dataset) -> None:
+    # Product with archived datasets only
+    index.datasets.archive([wo_eo3_dataset.id])
+    with index._active_connection(transaction=True) as conn:
+        assert conn.delete_datasets_for_product(wo_eo3_product.name) == (1, 0)
+    assert index.datasets.get(wo_eo3_dataset.id) is None
+
+    # Product with an archived and an active dataset
+    index.datasets.archive([ls8_eo3_dataset.id])
+    with index._active_connection(transaction=True) as conn:
+        assert conn.delete_datasets_for_product(ls8_eo3_product.name) == (1, 1)
+    assert index.datasets.get(ls8_eo3_dataset.id) is None
+    assert index.datasets.get(ls8_eo3_dataset2.id) is not None
+    assert index.products.delete([ls8_eo3_product]) == []
+    with index._active_connection(transaction=True) as conn:
+        assert conn.delete_datasets_for_product(ls8_eo3_product.name, allow_delete_active=True) == (1, 0)
+    assert index.datasets.get(ls8_eo3_dataset2.id) is None
+
+    # Both products can now be deleted
+    assert index.products.delete([ls8_eo3_product, wo_eo3_product]) == [ls8_eo3_product, wo_eo3_product]
+
+
 def test_product_delete_cli(index: Index,
                             clirunner,
                             ls8_eo3_product: Product,
@@ -224,6 +224,29 @@ def test_spatial_extent(index,
         crs=epsg4326
     )
     assert ext_ls8 == ext1234
+    # Computed in the database in an indexed CRS, as the union of the product's dataset extents
+    ext_ls8_3577 = index.products.spatial_extent(ls8_eo3_dataset.product, crs=epsg3577)
+    ext1234_3577 = index.datasets.spatial_extent(
+        [
+            ls8_eo3_dataset.id, ls8_eo3_dataset2.id,
+            ls8_eo3_dataset3.id, ls8_eo3_dataset4.id
+        ],
+        crs=epsg3577)
+    assert ext_ls8_3577.crs == epsg3577
+    assert ext_ls8_3577.symmetric_difference(ext1234_3577).area < 1.0
+    ext_africa = index.products.spatial_extent(africa_s2_eo3_product, crs=epsg3577)
+    assert ext_africa.symmetric_difference(
+        index.datasets.spatial_extent([africa_eo3_dataset.id], crs=epsg3577)
+    ).area < 1.0
+    # Archived datasets are excluded
+    index.datasets.archive([ls8_eo3_dataset4.id])
+    ext123_3577 = index.datasets.spatial_extent(
+        [ls8_eo3_dataset.id, ls8_eo3_dataset2.id, ls8_eo3_dataset3.id],
+        crs=epsg3577)
+    ext_ls8_3577 = index.products.spatial_extent(ls8_eo3_dataset.product, crs=epsg3577)
+    assert ext_ls8_3577.symmetric_difference(ext123_3577).area < 1.0
+    index.datasets.archive([ls8_eo3_dataset.id, ls8_eo3_dataset2.id, ls8_eo3_dataset3.id])
+    assert index.products.spatial_extent(ls8_eo3_dataset.product, crs=epsg3577) is None
 
 
 @pytest.mark.parametrize('datacube_env_name', ('postgis',))
@@ -289,3 +312,32 @@ def test_temporal_extents(index,
         ls8_eo3_dataset3.id, ls8_eo3_dataset4.id,
     ])
     assert start == start2 and end == end2
+
+
+@pytest.mark.parametrize('datacube_env_name', ('postgis',))
+def test_add_product_batch(index: Index, ls8_eo3_product):
+    description = "Réflectance de surface — Ångström ☀"
+    new_product = index.products.from_doc(
+        dict(ls8_eo3_product.definition, name="ls8_batch_copy", description=description)
+    )
+    # A product that is already indexed is skipped, not fatal to the rest of the batch
+    status = index.products._add_batch([ls8_eo3_product, new_product])
+    assert (status.completed, status.skipped) == (1, 1)
+    assert index.products.get_by_name("ls8_batch_copy").definition["description"] == description
+    # Nothing is left staged from the previous batch
+    status = index.products._add_batch([new_product])
+    assert (status.completed, status.skipped) == (0, 1)
+    with index.transaction():
+        status = index.products._add_batch([new_product])
+    assert (status.completed, status.skipped) == (0, 1)
+
+
+@pytest.mark.parametrize('datacube_env_name', ('postgis',))
+def test_get_all_products_rollback(index: Index, ls8_eo3_product):
+    names = {product.name for product in index.products.get_all()}
+    with pytest.raises(ValueError):
+        with index.transaction():
+            index.products.add_document(dict(ls8_eo3_product.definition, name="ls8_rolled_back"))
+            assert "ls8_rolled_back" in {product.name for product in index.products.get_all()}
+            raise ValueError("Roll back the new product")
+    assert {product.name for product in index.products.get_all()} == names
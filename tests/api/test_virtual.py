@@ -3,21 +3,30 @@
 # Copyright (c) 2015-2025 ODC Contributors
 # SPDX-License-Identifier: Apache-2.0
 from collections import OrderedDict
+import functools
 from datetime import datetime
 from copy import deepcopy
 import warnings
 
 import pytest
 from unittest import mock
+import threading
 import numpy
 import xarray as xr
+import dask.array
 
-from datacube.model import Product, MetadataType, Dataset
+from datacube.model import Product, MetadataType, Dataset, Measurement
 from odc.geo import CRS
+from odc.geo.geobox import GeoBox
 from odc.geo.gridspec import GridSpec
+from odc.geo.xr import xr_coords
+from odc.geo.warp import rio_reproject
+from odc.geo.overlap import compute_reproject_roi
+from affine import Affine
 from datacube.virtual import construct_from_yaml, catalog_from_yaml, VirtualProductException
 from datacube.virtual import DEFAULT_RESOLVER, Transformation
-from datacube.virtual.impl import Datacube
+from datacube.virtual.impl import Datacube, VirtualDatasetBox, from_validated_recipe, reproject_array, reproject_band
+from datacube.virtual.impl import _fetch_all, _reproject_tile_plan
 
 from datacube.virtual.expr import formula_parser, FormulaEvaluator, evaluate_data
 from datacube.virtual.transformations import fiscal_year
@@ -279,13 +288,17 @@ def test_str(cloud_free_nbar):
 
 
 def test_output_measurements(cloud_free_nbar, dc):
-    measurements = cloud_free_nbar.output_measurements({product.name: product
-                                                        for product in dc.index.products.get_all()})
+    product_definitions = {product.name: product for product in dc.index.products.get_all()}
+    measurements = cloud_free_nbar.output_measurements(product_definitions)
     assert 'blue' in measurements
     assert 'green' in measurements
     assert 'source_index' in measurements
     assert 'pixelquality' not in measurements
 
+    # repeated calls give equal results that can be modified independently
+    measurements.pop('blue')
+    assert cloud_free_nbar.output_measurements(product_definitions) == dict(measurements, blue=mock.ANY)
+
 
 def test_group_datasets(cloud_free_nbar, dc, query):
     bag = cloud_free_nbar.query(dc, **query)
@@ -294,6 +307,18 @@ def test_group_datasets(cloud_free_nbar, dc, query):
     [time] = box.box.shape
     assert time == 2
 
+    # the nbar and pq datasets for each timestamp are gathered together
+    inputs = box.input_datasets()
+    assert inputs.shape == box.box.shape
+    assert sorted(len(datasets) for datasets in inputs.values) == [2, 2]
+
+
+def test_shared_recipe():
+    nbar = {'product': 'ls8_nbar_albers'}
+    product = from_validated_recipe({'juxtapose': [{'collate': [nbar]}, {'collate': [nbar]}]})
+    [left], [right] = [child._children for child in product._children]
+    assert left is right
+
 
 def test_explode(dc, query):
     collate = construct_from_yaml("""
@@ -427,6 +452,27 @@ def test_expressions_transform(dc, query):
     assert 'green' not in data
 
 
+def test_fetch_all():
+    main = threading.get_ident()
+
+    # serial by default
+    assert _fetch_all([threading.get_ident] * 3, {}) == [main] * 3
+
+    def outer(index):
+        # the nested fetches stay on the thread of the outer one
+        inner = _fetch_all([threading.get_ident] * 3, {'fetch_workers': 4})
+        assert set(inner) == {threading.get_ident()}
+        return index, threading.get_ident()
+
+    results = _fetch_all([functools.partial(outer, index) for index in range(6)], {'fetch_workers': 2})
+    assert [index for index, _ in results] == list(range(6))
+    assert main not in {thread for _, thread in results}
+    assert len({thread for _, thread in results}) <= 2
+
+    # lazy loads only build graphs
+    assert _fetch_all([threading.get_ident] * 3, {'fetch_workers': 4, 'dask_chunks': {}}) == [main] * 3
+
+
 def test_aggregate(dc, query, catalog):
     aggr = catalog['mean_blue']
 
@@ -490,6 +536,108 @@ def test_reproject(dc, query, catalog):
     assert data.coords['y'].attrs['resolution'] == 30
 
 
+def test_reproject_array():
+    src_geobox = GeoBox.from_bbox((0, 0, 1000, 1000), 'EPSG:32755', resolution=10)
+    dst_geobox = GeoBox.from_bbox((0, 0, 1000, 1000), 'EPSG:32755', resolution=20)
+    src = numpy.arange(100 * 100, dtype='int16').reshape(100, 100)
+
+    result = reproject_array(src, -1, src_geobox, dst_geobox, 'nearest')
+    assert result.shape == dst_geobox.shape
+    assert result.dtype == src.dtype
+    assert numpy.array_equal(result, src[1::2, 1::2])
+
+    # bilinear resampling goes through the GDAL warp and its options
+    bilinear = reproject_array(src, -1, src_geobox, dst_geobox, 'bilinear')
+    threaded = reproject_array(src, -1, src_geobox, dst_geobox, 'bilinear', num_threads=2, warp_mem_limit=64)
+    assert numpy.array_equal(threaded, bilinear)
+
+    larger_geobox = GeoBox.from_bbox((-500, -500, 1500, 1500), 'EPSG:32755', resolution=20)
+    padded = reproject_array(src, -1, src_geobox, larger_geobox, 'nearest')
+    assert numpy.array_equal(padded[25:75, 25:75], result)
+    assert (padded[:25] == -1).all() and (padded[:, 75:] == -1).all()
+
+    empty = reproject_array(numpy.full_like(src, -1), -1, src_geobox, dst_geobox, 'nearest')
+    assert (empty == -1).all()
+
+    # the nearest neighbour gather for axis-aligned geoboxes agrees with GDAL
+    for affine in [Affine(20, 0, 3.3, 0, -20, 993.),
+                   Affine(25, 0, 65, 0, -25, 970),
+                   Affine(-7.5, 0, 1100, 0, 7.5, -50),
+                   Affine(20, 0, 5000, 0, -20, 993.)]:
+        other_geobox = GeoBox((40, 50), affine, 'EPSG:32755')
+        gdal = numpy.full(other_geobox.shape, -1, dtype=src.dtype)
+        rio_reproject(src, gdal, src_geobox, other_geobox, 'nearest', src_nodata=-1, dst_nodata=-1)
+        assert numpy.array_equal(reproject_array(src, -1, src_geobox, other_geobox, 'nearest'), gdal)
+        # every pixel of the destination is written
+        dst = numpy.full(other_geobox.shape, 77, dtype=src.dtype)
+        assert numpy.array_equal(reproject_array(src, -1, src_geobox, other_geobox, 'nearest', dst=dst), gdal)
+
+    src_nan = numpy.full((100, 100), numpy.nan, dtype='float32')
+    assert numpy.isnan(reproject_array(src_nan, numpy.nan, src_geobox, dst_geobox, 'nearest')).all()
+
+
+def test_reproject_band_dask():
+    src_geobox = GeoBox.from_bbox((0, 0, 1000, 1000), 'EPSG:32755', resolution=10)
+    dst_geobox = GeoBox.from_bbox((0, 0, 1000, 1000), 'EPSG:32755', resolution=20)
+    src = numpy.arange(100 * 100, dtype='int16').reshape(1, 100, 100)
+    coords = dict(time=[numpy.datetime64('2018-01-01')], **xr_coords(src_geobox, 'spatial_ref'))
+    dims = ('time',) + dst_geobox.dims
+
+    bands = [xr.DataArray(dask.array.from_array(src, chunks=(1, 50, 50)), name=name,
+                          dims=('time',) + src_geobox.dims, coords=coords, attrs={'nodata': -1})
+             for name in ['red', 'green']]
+    results = [reproject_band(band, dst_geobox, 'nearest', dims, dask_chunks={'x': 20, 'y': 20})
+               for band in bands]
+
+    # the same-CRS source windows contain the ones odc-geo finds
+    for tile_index, sub_geobox, roi_src in _reproject_tile_plan(src_geobox, dst_geobox, (20, 20)):
+        expected = compute_reproject_roi(src_geobox, sub_geobox, padding=1).roi_src
+        assert all(ours.start <= theirs.start and ours.stop >= theirs.stop for ours, theirs in zip(roi_src, expected))
+
+    for result in results:
+        assert result.dims == dims
+        assert result.data.chunks == ((1,), (20, 20, 10), (20, 20, 10))
+        assert numpy.array_equal(result.values[0], src[0, 1::2, 1::2])
+
+
+def test_reproject_fetch():
+    src_geobox = GeoBox.from_bbox((0, 0, 1000, 1000), 'EPSG:32755', resolution=10)
+    dst_geobox = GeoBox.from_bbox((0, 0, 1000, 1000), 'EPSG:32755', resolution=20)
+    times = numpy.array(['2018-01-01', '2018-02-01', '2018-03-01'], dtype='datetime64[ns]')
+    sources = {time: numpy.arange(100 * 100, dtype='int16').reshape(1, 100, 100) + index
+               for index, time in enumerate(times)}
+
+    class Input:
+        def output_measurements(self, product_definitions):
+            return {'red': Measurement(name='red', dtype='int16', nodata=-1, units='1')}
+
+        def fetch(self, grouped, **load_settings):
+            time = grouped.box.time.values
+            data = sources[time[0]]
+            if load_settings.get('dask_chunks') is not None:
+                data = dask.array.from_array(data, chunks=(1, 50, 50))
+            result = xr.Dataset(coords=dict(time=time, **xr_coords(src_geobox, 'spatial_ref')))
+            result['red'] = xr.DataArray(data, dims=('time',) + src_geobox.dims, attrs={'nodata': -1, 'units': '1'})
+            return result
+
+    reproject = from_validated_recipe({'reproject': {'output_crs': 'EPSG:32755', 'resolution': (-20, 20)},
+                                       'input': {'product': 'ls8_nbar_albers'}})
+    reproject.__dict__['_input'] = Input()
+
+    box = xr.DataArray(numpy.empty(len(times), dtype=object), dims=('time',), coords={'time': times})
+    for index in range(len(times)):
+        box.values[index] = ()
+    grouped = VirtualDatasetBox(box, dst_geobox, True, {}, geopolygon=None)
+
+    for load_settings in [{}, {'dask_chunks': {'time': 1, 'x': 20, 'y': 20}}]:
+        data = reproject.fetch(grouped, **load_settings)
+        assert data.red.dims == ('time',) + dst_geobox.dims
+        assert data.red.attrs['nodata'] == -1
+        assert (data.time.values == times).all()
+        for index, time in enumerate(times):
+            assert numpy.array_equal(data.red.values[index], sources[time][0, 1::2, 1::2])
+
+
 def test_fiscal_year():
     """
     Test fiscal year function
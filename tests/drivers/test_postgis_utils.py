@@ -15,3 +15,15 @@ def test_spindex_table_name():
     assert not is_spindex_table_name("spatial_-4326")
     assert not is_spindex_table_name("spatial_4326_spam")
     assert not is_spindex_table_name("spatial_spam_4326")
+
+
+def test_jsonb_copy_field():
+    import json
+    import struct
+    from datacube.drivers.postgis._api import _jsonb_copy_field
+    field = _jsonb_copy_field({"nodata": float("nan"), "name": "ls8"})
+    (length,) = struct.unpack(">i", field[:4])
+    assert length == len(field) - 4
+    # jsonb binary format version, followed by the json text
+    assert field[4:5] == b"\x01"
+    assert json.loads(field[5:]) == {"nodata": "NaN", "name": "ls8"}
@@ -0,0 +1,115 @@
+# This file is part of the Open Data Cube, see https://opendatacube.org for more information
+#
+# Copyright (c) 2015-2025 ODC Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import datetime
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from uuid import UUID
+
+import numpy
+import pytest
+
+from datacube.index.postgis import _products
+from datacube.index.postgis._products import ProductResource, _jsonify_definition, _versioned_lru_cache
+from datacube.utils import jsonify_document
+
+
+@pytest.mark.parametrize("doc", [
+    {"name": "ls8", "measurements": [{"name": "red", "dtype": numpy.dtype("int16"), "nodata": -999}]},
+    {True: "yes", False: "no"},
+    {1: "one", 2.5: "two and a half"},
+    {datetime.date(2020, 1, 1): "date key", Decimal("1.5"): "decimal key"},
+    {"nested": {"deeper": [{None: 1, 3: {False: Decimal("2.25")}}]}},
+    {"values": [Decimal("0.1"), datetime.datetime(2020, 1, 1, 12, 30), UUID(int=7), (1, 2)]},
+    {"nodata": float("nan"), "max": float("inf")},
+    {"measurements": [{"name": "flags", "nodata": None, "values": [1.5, float("-inf")]}]},
+])
+def test_jsonify_definition_matches_jsonify_document(doc):
+    # Compared as stored, where tuples and lists are both JSON arrays
+    assert _jsonify_definition(doc) == json.loads(json.dumps(jsonify_document(doc)))
+
+
+def test_jsonify_definition_nulls_use_orjson(monkeypatch):
+    pytest.importorskip("orjson")
+
+    def slow_path(doc):
+        raise AssertionError("jsonify_document should not be needed")
+
+    monkeypatch.setattr(_products, "jsonify_document", slow_path)
+    doc = {"description": "Nullable annulled flags", "nodata": None, "values": [1.5, None]}
+    assert _jsonify_definition(doc) == doc
+
+
+def test_add_batch_chunk_failure(monkeypatch):
+    monkeypatch.setattr(_products, "_MIN_BATCH_ROWS_PER_WORKER", 2)
+    monkeypatch.setattr(_products, "_MAX_BATCH_WORKERS", 3)
+    index = MagicMock()
+    index.thread_transaction.return_value = None
+    resource = ProductResource(MagicMock(), index)
+    products = [SimpleNamespace(name=f"prod_{i}") for i in range(6)]
+    attempted = []
+
+    def insert_rows(chunk):
+        names = [p.name for p in chunk]
+        attempted.extend(names)
+        if "prod_2" in names:
+            raise RuntimeError("connection lost")
+        # One product of each chunk was already indexed
+        return len(chunk) - 1, 1
+
+    resource._insert_product_rows = insert_rows
+    status = resource._add_batch(products[:2] + products[4:])
+    assert (status.completed, status.skipped) == (2, 2)
+    # A failed chunk is raised as on a single connection, after the other chunks have finished
+    attempted.clear()
+    with pytest.raises(RuntimeError, match="connection lost"):
+        resource._add_batch(products)
+    assert sorted(attempted) == [p.name for p in products]
+
+
+@pytest.mark.parametrize("ttl, in_transaction, fetches", [
+    (60, False, 1),
+    (0, False, 2),
+    (60, True, 2),
+])
+def test_get_all_cache(ttl, in_transaction, fetches):
+    index = MagicMock()
+    index.environment.product_cache_ttl = ttl
+    index.thread_transaction.return_value = MagicMock() if in_transaction else None
+    resource = ProductResource(MagicMock(), index)
+    resource._make_many = lambda rows: rows
+    connection = index._active_connection.return_value.__enter__.return_value
+    ls8 = SimpleNamespace(name="ls8")
+    connection.get_all_products.return_value = [ls8]
+    assert list(resource.get_all()) == [ls8]
+    assert list(resource.get_all()) == [ls8]
+    assert connection.get_all_products.call_count == fetches
+    # bulk_add always checks against a fresh list of existing products
+    assert resource.bulk_add([]).completed == 0
+    assert connection.get_all_products.call_count == fetches + 1
+
+
+def test_versioned_lru_cache():
+    fetched = []
+
+    def fetch(key):
+        fetched.append(key)
+        return f"{key}@{len(fetched)}"
+
+    resource = ProductResource(MagicMock(), MagicMock())
+    lookup = _versioned_lru_cache(fetch, resource._versions)
+    assert lookup(1) == "1@1"
+    assert lookup("ls8") == "ls8@2"
+    assert lookup(1) == "1@1"
+    # Only the bumped keys are fetched again
+    resource._bump_versions(1)
+    assert lookup(1) == "1@3"
+    assert lookup("ls8") == "ls8@2"
+    assert lookup(1) == "1@3"
+    assert fetched == [1, "ls8", 1]
+    lookup.cache_clear()
+    assert lookup("ls8") == "ls8@4"
@@ -221,6 +221,7 @@ def test_single_env(single_env_config):
     assert cfg['new']['db_iam_authentication']
     assert cfg['new'].db_iam_timeout == 600
     assert cfg['new']['db_connection_timeout'] == 60
+    assert cfg['new'].product_cache_ttl == 0
 
 
 def assert_simple_aliases(cfg):
@@ -6,7 +6,7 @@ import os
 import pytest
 from uuid import uuid4 as random_uuid
 
-from datacube.model import LineageDirection, LineageTree, InconsistentLineageException
+from datacube.model import LineageDirection, LineageTree, LineageRelation, InconsistentLineageException
 from datacube.model.lineage import LineageRelations, LineageIDPair
 from datacube.utils import read_documents
 
@@ -627,3 +627,79 @@ def test_merge_tree_limited_depth(big_src_lineage_tree, big_src_tree_ids):
 
     rels = LineageRelations(tree=big_src_lineage_tree, max_depth=7)
     assert ids["atmos_parent"] in rels.dataset_ids
+
+
+def test_detect_cyclic_deps_out_of_order():
+    a, b, c, d = (random_uuid() for _ in range(4))
+    # Relations added out of topological order must still be accepted...
+    rels = LineageRelations(relations=[
+        LineageRelation(classifier="x", source_id=c, derived_id=d),
+        LineageRelation(classifier="x", source_id=a, derived_id=b),
+        LineageRelation(classifier="x", source_id=b, derived_id=c),
+    ])
+    assert rels.extract_tree(d).child_datasets() == {a, b, c}
+    # ...and a relation closing a long loop must be rejected.
+    with pytest.raises(InconsistentLineageException, match="LineageTrees must be acyclic"):
+        rels.merge_new_lineage_relation(LineageRelation(classifier="x", source_id=d, derived_id=a))
+    assert LineageIDPair(derived_id=a, source_id=d) not in rels.relations_diff()[0]
+
+
+def test_child_datasets_deep_tree():
+    # Deeper than the default recursion limit
+    ids = [random_uuid() for _ in range(5000)]
+    tree = LineageTree(dataset_id=ids[-1], direction=LineageDirection.SOURCES, children={})
+    for dsid in reversed(ids[:-1]):
+        tree = LineageTree(dataset_id=dsid, direction=LineageDirection.SOURCES, children={"x": [tree]})
+    assert tree.child_datasets() == set(ids[1:])
+    # A dataset appearing further down its own branch is a cycle
+    tree.children["x"][0].children["x"][0].children["y"] = [
+        LineageTree(dataset_id=ids[0], direction=LineageDirection.SOURCES)
+    ]
+    with pytest.raises(InconsistentLineageException, match="LineageTrees must be acyclic"):
+        tree.child_datasets()
+
+
+def test_relations_diff_conflicts(big_src_lineage_tree, classifier_mismatch, big_src_tree_ids):
+    rels1 = LineageRelations(tree=big_src_lineage_tree)
+    rels2 = LineageRelations(tree=classifier_mismatch)
+    with pytest.raises(InconsistentLineageException, match="with inconsistent classifiers"):
+        rels1.relations_diff(existing_relations=rels2)
+    # Cycles spanning both collections are detected
+    breaking = LineageRelations(relations=[
+        LineageRelation(classifier="cyclic_dep", source_id=big_src_tree_ids["root"],
+                        derived_id=big_src_tree_ids["atmos_parent"])
+    ])
+    with pytest.raises(InconsistentLineageException, match="LineageTrees must be acyclic"):
+        breaking.relations_diff(existing_relations=rels1)
+
+    # Cycles closed only by several new relations together are detected, without touching the existing collection
+    a, b = random_uuid(), random_uuid()
+    existing = LineageRelations(relations=[LineageRelation(classifier="x", source_id=a, derived_id=b)])
+    order = dict(existing._order)
+    c = random_uuid()
+    breaking = LineageRelations(relations=[
+        LineageRelation(classifier="x", source_id=b, derived_id=c),
+        LineageRelation(classifier="x", source_id=c, derived_id=a),
+    ])
+    with pytest.raises(InconsistentLineageException, match="LineageTrees must be acyclic"):
+        breaking.relations_diff(existing_relations=existing)
+    assert existing._order == order
+    assert existing.dataset_ids == {a, b}
+    # Out-of-order but acyclic additions are accepted
+    fine = LineageRelations(relations=[
+        LineageRelation(classifier="x", source_id=c, derived_id=a),
+        LineageRelation(classifier="x", source_id=random_uuid(), derived_id=c),
+    ])
+    assert len(fine.relations_diff(existing_relations=existing)[0]) == 2
+    assert existing._order == order
+
+
+def test_lin_rels_deep_tree():
+    # Deeper than the default recursion limit
+    ids = [random_uuid() for _ in range(5000)]
+    tree = LineageTree(dataset_id=ids[-1], direction=LineageDirection.SOURCES, children={})
+    for dsid in reversed(ids[:-1]):
+        tree = LineageTree(dataset_id=dsid, direction=LineageDirection.SOURCES, children={"x": [tree]})
+    rels = LineageRelations(tree=tree)
+    assert rels.dataset_ids == set(ids)
+    assert rels.extract_tree(ids[0]).child_datasets() == set(ids[1:])
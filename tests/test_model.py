@@ -347,6 +347,29 @@ def test_metadata_type():
     assert m.dataset_reader({}) is not None
 
 
+def test_metadata_type_fields_index():
+    m = MetadataType({'name': 'eo',
+                      'dataset': dict(
+                          id=['id'],
+                          label=['ga_label'],
+                          creation_time=['creation_dt'],
+                          measurements=['image', 'bands'],
+                          sources=['lineage', 'source_datasets'],
+                          format=['format', 'name'],
+                          search_fields=dict(
+                              platform=dict(description='Platform code',
+                                            offset=['platform', 'code'])
+                          ))})
+
+    index = m.dataset_fields_index
+    assert set(index) == set(m.dataset_fields)
+    field, extract = index['platform']
+    assert field is m.dataset_fields['platform']
+    assert extract({'platform': {'code': 'LANDSAT_8'}}) == 'LANDSAT_8'
+    # Cached on first use
+    assert m.dataset_fields_index is index
+
+
 def test_ranges_overlap():
     assert not ranges_overlap(
         Range(begin=1, end=5),